@@ -88,7 +88,14 @@ chaquopy {
             include("app.py")
             include("config.py")
             include("game_engine.py")
+            include("journal.py")
+            include("metrics.py")
+            include("outbox.py")
+            include("ratelimit.py")
             include("roles.py")
+            include("rooms.py")
+            include("scheduler.py")
+            include("snapshots.py")
             include(".env.werewolves")
 
             // INCLUDE FOLDERS (Using ** to get all files inside them)
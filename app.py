@@ -4,6 +4,7 @@ Version: 5.2.6.1
 """
 import json
 import logging
+import hmac
 import html
 import os
 from os.path import join, dirname, exists
@@ -11,6 +12,7 @@ import time
 import traceback # for debugging
 import uuid
 from collections import Counter
+from functools import wraps
 from dotenv import find_dotenv, load_dotenv
 from flask import (
     Flask,
@@ -23,10 +25,18 @@ from flask import (
     url_for,
 )
 from flask_socketio import SocketIO, emit, join_room
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 from config import GAME_DEFAULTS
 from game_engine import *
 from roles import *
+from metrics import Metrics
+from outbox import Outbox
+from rooms import CHAT_CHANNELS, RoomRegistry
+from scheduler import TimerScheduler
+from journal import Journal
+from ratelimit import RateLimiter
+from snapshots import SnapshotStore
 
 # --- App Initialization ---
 # android web config
@@ -45,10 +55,48 @@ else:
     print("No specific .env.werewolves found. Searching for default .env...")
     load_dotenv(find_dotenv())
 
+# Room snapshots survive restarts (opt-in, relative paths are next to app.py)
+snapshot_dir = os.environ.get("SNAPSHOT_DIR", "")
+snapshot_store = None
+if snapshot_dir:
+    try:
+        snapshot_store = SnapshotStore(join(dirname(__file__), snapshot_dir))
+    except OSError as e:
+        print(f"WARNING: Snapshot directory {snapshot_dir} unusable, snapshots disabled: {e}")
+print(f"Room snapshots: {snapshot_store.directory if snapshot_store else 'disabled'}")
+
+# Per-game event journals for offline replay (python replay.py <file>), empty disables
+journal_dir = os.environ.get("JOURNAL_DIR", "")
+if journal_dir:
+    journal_dir = join(dirname(__file__), journal_dir)
+    try:
+        os.makedirs(journal_dir, exist_ok=True)
+        print(f"Game journals: {journal_dir}")
+    except OSError as e:
+        print(f"WARNING: Journal directory {journal_dir} unusable, journals disabled: {e}")
+        journal_dir = ""
+
+
+def load_or_create_secret_key(key_path):
+    """Keeps a generated key across restarts, or restored rooms could not read old sessions."""
+    try:
+        with open(key_path, encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        key = str(uuid.uuid4())
+        with open(os.open(key_path, os.O_WRONLY | os.O_CREAT, 0o600), "w", encoding="utf-8") as f:
+            f.write(key)
+        return key
+
+
 app = Flask(__name__)
 # IMPORTANT: In production, this MUST be set as an environment variable in .env.werewolves
 raw_key = os.environ.get("FLASK_SECRET_KEY")
-if not raw_key:
+secret_key_file = os.environ.get("SECRET_KEY_FILE", "")
+if not raw_key and secret_key_file:
+    print(f"WARNING: FLASK_SECRET_KEY not found in environment. Using the key in {secret_key_file}.")
+    app.config["SECRET_KEY"] = load_or_create_secret_key(join(dirname(__file__), secret_key_file))
+elif not raw_key:
     print("WARNING: FLASK_SECRET_KEY not found in environment. Generating a random key for this session.")
     app.config["SECRET_KEY"] = str(uuid.uuid4())
 else:
@@ -64,6 +112,12 @@ app.config["SESSION_COOKIE_SECURE"] = os.environ.get("USE_HTTPS", "False").lower
 # 3. Prevent Cross-Site Request Forgery (CSRF) on login
 app.config["SESSION_COOKIE_SAMESITE"] = "Lax"
 
+# 4. request.remote_addr is the client's address. Behind nginx set TRUSTED_PROXIES=1, so
+# it comes from the X-Forwarded-For entry nginx added, never from one the client sent
+trusted_proxies = int(os.environ.get("TRUSTED_PROXIES", "0") or 0)
+if trusted_proxies > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies)
+
 log = logging.getLogger("werkzeug")
 log.setLevel(logging.ERROR)
 
@@ -99,9 +153,15 @@ def t_server(key, lang="en"):
     return dataset.get(key, key)
 
 # --- Global State ---
-game_instance = Game("main_game")
+# Every table lives in its own Room (Game + wrappers + lobby state), keyed by game code
+rooms = RoomRegistry(snapshots=snapshot_store)
 
-join_attempts = {} # for rate limiting
+# Load tests (benchmarks/loadtest.py) log in hundreds of bots from one address
+rate_limits = GAME_DEFAULTS["RATE_LIMITS"]
+if os.environ.get("DISABLE_RATE_LIMITS", "False").lower() == "true":
+    print("WARNING: DISABLE_RATE_LIMITS is set. Logins and chat are not rate limited.")
+    rate_limits = {}
+rate_limiter = RateLimiter(rate_limits, GAME_DEFAULTS["RATE_LIMIT_MAX_KEYS"])
 
 # Configure CORS for Socket.IO from environment variables
 # This is crucial for security in a production environment.
@@ -139,26 +199,54 @@ else:
 
 print(f"Origins: ", origins)
 
+# Socket.IO wire format: "default" (JSON) or "msgpack" (binary, smaller). msgpack needs
+# requirements-optional.txt and the msgpack build of the Socket.IO client (vendor_js.py)
+socketio_serializer = os.environ.get("SOCKETIO_SERIALIZER", "default").lower()
+if socketio_serializer == "msgpack":
+    try:
+        import msgpack  # noqa: F401
+    except ImportError:
+        print("WARNING: SOCKETIO_SERIALIZER=msgpack but msgpack is not installed. Using JSON.")
+        socketio_serializer = "default"
+    if not exists(join(dirname(__file__), "static", "socket.io.msgpack.min.js")):
+        print("WARNING: SOCKETIO_SERIALIZER=msgpack but static/socket.io.msgpack.min.js is missing (run vendor_js.py). Using JSON.")
+        socketio_serializer = "default"
+elif socketio_serializer != "default":
+    print(f"WARNING: Unknown SOCKETIO_SERIALIZER '{socketio_serializer}'. Using JSON.")
+    socketio_serializer = "default"
+print(f"Socket.IO serializer: {socketio_serializer}")
+
+# Several workers: each room lives in exactly one worker (nginx hashes ROOM_COOKIE),
+# and broadcasts go through a message queue (redis://, amqp://, kafka://, zmq+tcp://).
+# Unset runs python-socketio's in-process client manager, as a single worker needs.
+socketio_message_queue = os.environ.get("SOCKETIO_MESSAGE_QUEUE") or None
+print(f"Socket.IO message queue: {socketio_message_queue}")
+ROOM_COOKIE = "werewolves_room"
+
 # 3. Initialize SocketIO with the variable
 socketio = SocketIO(
     app,
     cors_allowed_origins=origins,
-    async_mode=socketio_async_mode # type: ignore
+    async_mode=socketio_async_mode, # type: ignore
+    serializer=socketio_serializer,
+    message_queue=socketio_message_queue,
+    channel=os.environ.get("SOCKETIO_CHANNEL", "werewolves"),
 )
 
-# Game Dictionary stores connection/wrapper info
-game = {
-    "admin_sid": None,
-    "game_code": GAME_DEFAULTS["DEFAULT_CODE"],
-    "game_state": PHASE_LOBBY,
-    "players": {},  # Dict[player_id(uuid), PlayerWrapper_Obj]
-}
 
-lobby_state = {
-    "selected_roles": GAME_DEFAULTS["DEFAULT_ROLES"],
-    "settings": {},
-}
+@app.context_processor
+def inject_socketio_serializer():
+    """Templates load the msgpack build of the Socket.IO client only when the server speaks msgpack."""
+    return {"socketio_serializer": socketio_serializer}
+
+# Handler/route latency, errors and emitted bytes, served at /metrics to local
+# scrapers, or to anyone sending "Authorization: Bearer <METRICS_TOKEN>" when set
+metrics_token = os.environ.get("METRICS_TOKEN", "")
+metrics = Metrics()
+metrics.instrument_flask(app)
 
+# Buffers emits while a handler runs and sends one frame per recipient
+outbox = Outbox()
 
 class PlayerWrapper:
     def __init__(self, name, sid, language="en"):
@@ -166,27 +254,96 @@ class PlayerWrapper:
         self.sid = sid
         self.is_admin = False
         self.language = language
+        self.connected = True
+        self.reset_sync()
+
+    def reset_sync(self):
+        """Forget the client's state baseline so the next sync is sent in full."""
+        self.state_version = 0
+        self.acked_version = None
+        self.last_state = None
+
+
+def restore_player_wrapper(data):
+    """Wrapper from a room snapshot; sid and admin_sid come back when the player reconnects."""
+    wrapper = PlayerWrapper(data["name"], None, language=data["language"])
+    wrapper.is_admin = data["is_admin"]
+    wrapper.connected = False
+    return wrapper
+
+
+rooms.restore_wrapper = restore_player_wrapper
 
 
 # --- Helper Functions ---
-def get_player_by_sid(sid):
-    for player_id, player_wrapper in game["players"].items():
-        if player_wrapper.sid == sid:
-            return player_id, player_wrapper
-    return None, None
+def get_room():
+    """
+    Resolves the caller's room from the session.
+    Joined players are found through the registry index (survives code changes),
+    players who just logged in through the code they submitted on the index page.
+    """
+    room = rooms.room_for_player(session.get("player_id"))
+    if room:
+        return room
+    return rooms.get(session.get("game_code"))
+
+
+def get_player_by_sid(room, sid):
+    """O(1) through the registry's sid index. Pass room=None to search every room."""
+    if room is None:
+        room, player_id = rooms.lookup_sid(sid)
+        if not room:
+            return None, None
+    else:
+        player_id = rooms.player_for_sid(sid)
+    player_wrapper = room.game["players"].get(player_id)
+    if not player_wrapper:
+        return None, None
+    return player_id, player_wrapper
 
 
-def log_and_emit(message):
+def get_or_create_room():
+    """get_room() for a connecting player, the table is opened on its first connect."""
+    if not session.get("player_id"):
+        return None
+    return get_room() or rooms.get_or_create(session.get("game_code"))
+
+
+def room_locked(resolve_room=get_room):
+    """
+    Runs a Socket.IO handler under its room's lock, so one table's events apply
+    one at a time (phase resolutions included) while other tables run in parallel.
+    Buffered emits are flushed before the lock is released, keeping their order.
+    """
+
+    def decorate(handler):
+        @wraps(handler)
+        def locked_handler(*args, **kwargs):
+            room = resolve_room()
+            if not room:
+                return handler(*args, **kwargs)
+            with room.lock:
+                try:
+                    return handler(*args, **kwargs)
+                finally:
+                    outbox.flush()
+
+        return locked_handler
+
+    return decorate
+
+
+def log_and_emit(room, message):
     print(message)
-    socketio.emit("log_message", {"text": message}, to=game["game_code"])
+    socketio.emit("log_message", {"text": message}, to=room.game["game_code"])
 
 
-def broadcast_player_list():
+def broadcast_player_list(room):
     player_list_data = []
-    for player_id, player_wrapper in game["players"].items():
+    for player_id, player_wrapper in room.game["players"].items():
         is_alive = True
-        if player_id in game_instance.players:
-            is_alive = game_instance.players[player_id].is_alive
+        if player_id in room.game_instance.players:
+            is_alive = room.game_instance.players[player_id].is_alive
 
         player_list_data.append(
             {
@@ -200,77 +357,92 @@ def broadcast_player_list():
         "update_player_list",
         {
             "players": player_list_data,
-            "game_code": game["game_code"],
-            "admin_only_chat": game_instance.admin_only_chat,
+            "game_code": room.game["game_code"],
+            "admin_only_chat": room.game_instance.admin_only_chat,
         },
-        to=game["game_code"],
+        to=room.game["game_code"],
     )
+    rooms.checkpoint(room)
 
 
-def get_public_game_state():
+def get_public_game_state(room):
     """
-    Generates the game state data common to ALL players.
-    Optimization: Calculated once per tick/broadcast.
+    Returns the game state data common to ALL players.
+    Cached per room until the Game version changes, only the countdown and
+    history sequence are filled in fresh on every call.
     """
+    game = room.game_instance
+    cached = room.public_state_cache
+    if cached is None or cached[0] != game.version:
+        public_data = build_public_game_state(room)
+        if not public_data:
+            return None
+        cached = room.public_state_cache = (game.version, public_data)
+
+    remaining_time = 0
+    if game.phase_start_time and not game.timers_disabled:
+        if game.phase in game.timer_durations:
+            elapsed = time.time() - game.phase_start_time
+            remaining_time = max(0, game.timer_durations[game.phase] - elapsed)
+
+    public_data = cached[1].copy()
+    public_data["duration"] = remaining_time
+    public_data["history_seq"] = game.message_history.last_seq
+    return public_data
+
+
+def build_public_game_state(room):
+    """Computes the public state from scratch. Use get_public_game_state()."""
     try:
         all_players_data = []
-        for p in game_instance.players.values():
+        for p in room.game_instance.players.values():
             lang = "en"
-            if p.id in game["players"]:
-                lang = game["players"][p.id].language
+            if p.id in room.game["players"]:
+                lang = room.game["players"][p.id].language
 
             all_players_data.append(
                 {"id": p.id, "name": p.name, "is_alive": p.is_alive, "language": lang}
             )
 
         accusation_counts = {}
-        if game_instance.phase == PHASE_ACCUSATION:
-            accusation_counts = dict(Counter(game_instance.pending_actions.values()))
-
-        remaining_time = 0
-        if game_instance.phase_start_time and not game_instance.timers_disabled:
-            key = game_instance.phase
-            if key in game_instance.timer_durations:
-                elapsed = time.time() - game_instance.phase_start_time
-                remaining_time = max(0, game_instance.timer_durations[key] - elapsed)
+        if room.game_instance.phase == PHASE_ACCUSATION:
+            accusation_counts = dict(Counter(room.game_instance.pending_actions.values()))
 
         lynch_target_name = None
-        if game_instance.lynch_target_id:
-            target_obj = game_instance.players.get(game_instance.lynch_target_id)
+        if room.game_instance.lynch_target_id:
+            target_obj = room.game_instance.players.get(room.game_instance.lynch_target_id)
             if target_obj:
                 lynch_target_name = target_obj.name
 
         acted_ids = []
-        if game_instance.phase == PHASE_NIGHT:
-            acted_ids = list(game_instance.turn_history)
-        elif game_instance.phase == PHASE_ACCUSATION:
+        if room.game_instance.phase == PHASE_NIGHT:
+            acted_ids = list(room.game_instance.turn_history)
+        elif room.game_instance.phase == PHASE_ACCUSATION:
             acted_ids = list(
-                set(game_instance.pending_actions.keys()) | game_instance.end_day_votes
+                set(room.game_instance.pending_actions.keys()) | room.game_instance.end_day_votes
             )
-        elif game_instance.phase == PHASE_LYNCH:
-            acted_ids = list(game_instance.pending_actions.keys())
+        elif room.game_instance.phase == PHASE_LYNCH:
+            acted_ids = list(room.game_instance.pending_actions.keys())
 
         return {
             "accusation_counts": accusation_counts,
             "acted_players": acted_ids,
-            "admin_only_chat": game_instance.admin_only_chat,
+            "admin_only_chat": room.game_instance.admin_only_chat,
             "all_players": all_players_data,
-            "duration": remaining_time,
-            "game_over_data": game_instance.game_over_data,
-            "ghost_mode_active": game_instance.is_ghost_mode_active(),
+            "game_over_data": room.game_instance.game_over_data,
+            "ghost_mode_active": room.game_instance.is_ghost_mode_active(),
             "living_players": [
-                {"id": p.id, "name": p.name} for p in game_instance.get_living_players()
+                {"id": p.id, "name": p.name} for p in room.game_instance.get_living_players()
             ],
-            "lynch_target_id": game_instance.lynch_target_id,
+            "lynch_target_id": room.game_instance.lynch_target_id,
             "lynch_target_name": lynch_target_name,
-            "message_history": game_instance.message_history,
-            "mode": game_instance.mode,
-            "phase": game_instance.phase,
-            "phase_end_time": game_instance.phase_end_time,
-            "rematch_vote_count": len(game_instance.rematch_votes),
-            "sleep_vote_count": len(game_instance.end_day_votes),
-            "timers_disabled": game_instance.timers_disabled,
-            "total_accusation_duration": game_instance.timer_durations.get(
+            "mode": room.game_instance.mode,
+            "phase": room.game_instance.phase,
+            "phase_end_time": room.game_instance.phase_end_time,
+            "rematch_vote_count": len(room.game_instance.rematch_votes),
+            "sleep_vote_count": len(room.game_instance.end_day_votes),
+            "timers_disabled": room.game_instance.timers_disabled,
+            "total_accusation_duration": room.game_instance.timer_durations.get(
                 PHASE_ACCUSATION, 90
             ),
         }
@@ -279,68 +451,79 @@ def get_public_game_state():
         return None
 
 
-def generate_player_payload(player_id, player_wrapper=None, public_data=None):
+def get_private_role_state(room, engine_player_obj):
+    """
+    Returns (role string, night UI schema, valid targets) for one player.
+    Role logic only reruns after a phase change, a death, or the
+    player's own action; votes by others reuse the cached result.
+    """
+    game = room.game_instance
+    key = (game.phase, game.night_count, game.roster_version, engine_player_obj.action_serial)
+    cached = room.private_cache.get(engine_player_obj.id)
+    if cached and cached[0] == key:
+        return cached[1]
+
+    role = engine_player_obj.role
+    role_str = role.name_key if role else "Unknown"
+    night_ui = None
+    valid_targets_data = []
+    if role:
+        ctx = game.build_context()
+        if game.phase == PHASE_NIGHT and engine_player_obj.is_alive:
+            night_ctx = dict(ctx, villager_prompt_index=game.get_current_prompt_index())
+            night_ui = role.get_night_ui_schema(engine_player_obj, night_ctx)
+
+        targets = role.get_valid_targets(ctx)
+        valid_targets_data = [{"id": t.id, "name": t.name} for t in targets]
+
+    private_state = (role_str, night_ui, valid_targets_data)
+    room.private_cache[engine_player_obj.id] = (key, private_state)
+    return private_state
+
+
+def generate_player_payload(room, player_id, player_wrapper=None, public_data=None):
     """
     Generates the specific game state payload for a given player ID.
     Accepts pre-calculated public_data for optimization.
     """
     # 1. Use provided Public Data or generate it (CPU Optimization)
     if public_data is None:
-        public_data = get_public_game_state()
+        public_data = get_public_game_state(room)
     if not public_data:
         return None
 
     # 2. Private Data (Specific to the requested player_id)
-    engine_player_obj = game_instance.players.get(player_id)
+    engine_player_obj = room.game_instance.players.get(player_id)
     if not engine_player_obj:
         return None
 
-    role_str = engine_player_obj.role.name_key if engine_player_obj.role else "Unknown"
     is_alive = engine_player_obj.is_alive
-    night_ui = None
-
-    if (
-        game_instance.phase == PHASE_NIGHT
-        and engine_player_obj.role
-        and engine_player_obj.is_alive
-    ):
-        ctx = {
-            "players": list(game_instance.players.values()),
-            "villager_prompt_index": game_instance.get_current_prompt_index(),
-        }
-        night_ui = engine_player_obj.role.get_night_ui_schema(engine_player_obj, ctx)
+    role_str, night_ui, valid_targets_data = get_private_role_state(room, engine_player_obj)
 
     # Retrieve Player Actions
-    my_phase_target_id = game_instance.get_player_phase_choice(player_id)
-    my_phase_metadata = game_instance.get_player_phase_choice(player_id, True)
-    my_sleep_vote = game_instance.has_player_voted_to_sleep(player_id)
+    my_phase_target_id = room.game_instance.get_player_phase_choice(player_id)
+    my_phase_metadata = room.game_instance.get_player_phase_choice(player_id, True)
+    my_sleep_vote = room.game_instance.has_player_voted_to_sleep(player_id)
 
     # Resolve Target Names for UI feedback
     my_phase_target_name = None
     if my_phase_target_id:
-        target_obj = game_instance.players.get(my_phase_target_id)
+        target_obj = room.game_instance.players.get(my_phase_target_id)
         if target_obj:
             my_phase_target_name = target_obj.name
 
-    valid_targets_data = []
-    if engine_player_obj.role:
-        targets = engine_player_obj.role.get_valid_targets(
-            {"players": list(game_instance.players.values())}
-        )
-        valid_targets_data = [{"id": t.id, "name": t.name} for t in targets]
-
     # 3. Admin Status
     is_admin = False
     if player_wrapper:
         is_admin = player_wrapper.is_admin
     else:
-        wrapper = game["players"].get(player_id)
+        wrapper = room.game["players"].get(player_id)
         if wrapper:
             is_admin = wrapper.is_admin
 
     target_wrapper = player_wrapper
     if not target_wrapper:
-        target_wrapper = game["players"].get(player_id)
+        target_wrapper = room.game["players"].get(player_id)
 
     # Default to 'en' if missing
     player_lang = "en"
@@ -358,11 +541,12 @@ def generate_player_payload(player_id, player_wrapper=None, public_data=None):
             "my_phase_target_id": my_phase_target_id,
             "my_phase_metadata": my_phase_metadata,
             "my_phase_target_name": my_phase_target_name,
-            "my_rematch_vote": player_id in game_instance.rematch_votes,
+            "my_rematch_vote": player_id in room.game_instance.rematch_votes,
             "my_sleep_vote": my_sleep_vote,
             "night_ui": night_ui,
             "this_player_id": player_id,
             "valid_targets": valid_targets_data,
+            "werewolf_chat": in_werewolf_chat(room.game_instance, player_id),
             "language": player_lang,
             "your_role": role_str,
         }
@@ -371,87 +555,240 @@ def generate_player_payload(player_id, player_wrapper=None, public_data=None):
     return payload
 
 
-def broadcast_game_state():
-    """Syncs the FULL Engine state to all clients efficiently."""
-    # 1. Generate Public Data Once (CPU Optimization)
-    public_data = get_public_game_state()
-    if not public_data:
+def send_state_sync(player_wrapper, payload, full=False):
+    """
+    Sends a player's game state, versioned per client.
+    Once the client has acknowledged a version, only the keys that changed since
+    the last state sent go out as a game_state_delta. The client asks for a full
+    resync (client_ready_for_game) if it ever sees a version gap.
+    """
+    previous = player_wrapper.last_state
+    player_wrapper.state_version += 1
+    version = player_wrapper.state_version
+    player_wrapper.last_state = payload
+
+    if full or previous is None or player_wrapper.acked_version is None:
+        full_payload = payload.copy()
+        full_payload["state_version"] = version
+        socketio.emit("game_state_sync", full_payload, to=player_wrapper.sid)
         return
 
-    for player_id, player_wrapper in game["players"].items():
-        if not player_wrapper.sid:
-            continue
+    changed = {}
+    for key, value in payload.items():
+        if key not in previous or previous[key] != value:
+            changed[key] = value
+    removed = [key for key in previous if key not in payload]
+
+    socketio.emit(
+        "game_state_delta",
+        {
+            "base_version": version - 1,
+            "state_version": version,
+            "changed": changed,
+            "removed": removed,
+        },
+        to=player_wrapper.sid,
+    )
+
 
-        # 2. Generate private payload using cached public data
-        payload = generate_player_payload(
-            player_id, player_wrapper, public_data=public_data
+def broadcast_game_state(room):
+    """Syncs the FULL Engine state to all clients efficiently."""
+    with metrics.timer("broadcast_game_state"):
+        # 1. Generate Public Data Once (CPU Optimization)
+        public_data = get_public_game_state(room)
+        if not public_data:
+            return
+
+        for player_id, player_wrapper in room.game["players"].items():
+            if not player_wrapper.sid:
+                continue
+
+            # 2. Generate private payload using cached public data
+            payload = generate_player_payload(
+                room, player_id, player_wrapper, public_data=public_data
+            )
+            if payload:
+                send_state_sync(player_wrapper, payload)
+
+    rooms.checkpoint(room)
+
+
+def continue_after_pause(room, continuation):
+    """
+    Gives players PAUSE_DURATION to read results, then runs continuation(room)
+    from the timer queue instead of sleeping, so the handler returns right away.
+    Until then the room takes no actions or resolutions (see transition_pending).
+    """
+    pause = GAME_DEFAULTS["PAUSE_DURATION"]
+    if pause <= 0:
+        return continuation(room)
+    room.pending_transition = continuation
+    timer_scheduler.schedule(
+        time.time() + pause, resume_transition, room, room.game_instance, continuation
+    )
+    # A restart during the pause must not resolve the phase again, so save that it is pending
+    rooms.checkpoint(room)
+
+
+def resume_transition(room, game, continuation):
+    """Dropped if the game was replaced (rematch, new code) while it waited."""
+    with room.lock:
+        if room.game_instance is not game or room.pending_transition is not continuation:
+            return
+        room.pending_transition = None
+        with app.app_context(), outbox.collect(), metrics.timer("pause_continuation"):
+            continuation(room)
+
+
+def transition_pending(room):
+    return room.pending_transition is not None
+
+
+def resume_restored_transition(room):
+    """Queues the continuation a snapshot was waiting on when the server stopped."""
+    name, room.restored_transition = room.restored_transition, None
+    continuations = {
+        continuation.__name__: continuation
+        for continuation in (
+            resolve_night,
+            restart_accusations,
+            broadcast_game_state,
+            check_game_over_or_next_phase,
         )
-        if payload:
-            socketio.emit("game_state_sync", payload, to=player_wrapper.sid)
+    }
+    if name in continuations:
+        continue_after_pause(room, continuations[name])
 
 
 # --- Timer System ---
-game_loop_running = False
-
-
-def background_game_loop():
-    """Central heartbeat that ticks the engine every second."""
-    global game_loop_running
-    print(">>> Game Loop Started <<<")
-    while game_loop_running:
-        socketio.sleep(1)
-        with app.app_context():
-            result = game_instance.tick()
-            if result == "TIMEOUT":
-                log_and_emit(f"Timer expired for {game_instance.phase}.")
-                if game_instance.phase == PHASE_NIGHT:
-                    resolve_night()
-                elif game_instance.phase == PHASE_ACCUSATION:
-                    perform_tally_accusations()
-                elif game_instance.phase == PHASE_LYNCH:
-                    resolve_lynch()
-
-
-def perform_tally_accusations():
-    outcome = game_instance.tally_accusations()
+# One deadline queue for all rooms, the task sleeps until the next phase expires
+timer_scheduler = TimerScheduler(
+    socketio.start_background_task, socketio.server.eio.create_event
+)
+
+
+def watch_game(room):
+    """Hooks a new Game's phase timers and chat channel membership."""
+    room.game_instance.on_player_status = lambda game, player: sync_chat_channels(room, player)
+    watch_phase_timers(room)
+    if room.restored_transition:
+        resume_restored_transition(room)
+
+
+def sync_chat_channels(room, player_obj):
+    """Keeps a player's socket in the living/ghost/werewolves rooms matching their state."""
+    wrapper = room.game["players"].get(player_obj.id)
+    if not wrapper or not wrapper.sid:
+        return
+    member_of = {
+        "living": player_obj.is_alive,
+        "ghost": not player_obj.is_alive,
+        "werewolves": in_werewolf_chat(room.game_instance, player_obj.id),
+    }
+    for name, is_member in member_of.items():
+        if is_member:
+            socketio.server.enter_room(wrapper.sid, room.channel(name), namespace="/")
+        else:
+            socketio.server.leave_room(wrapper.sid, room.channel(name), namespace="/")
+
+
+def close_table_rooms(room):
+    """Empties the table's Socket.IO room and its chat channels, e.g. before its code changes."""
+    for name in (room.code, *(room.channel(channel) for channel in CHAT_CHANNELS)):
+        socketio.close_room(name)
+
+
+def in_werewolf_chat(game, player_id):
+    """
+    Living members of the Werewolves team (team index, so a turned Wild Child counts).
+    Never in pass-and-play, everyone reads the one shared screen.
+    """
+    if game.isPassAndPlay:
+        return False
+    return player_id in game.living_by_team.get("Werewolves", {})
+
+
+def watch_phase_timers(room):
+    """Hooks a new Game so every set_phase queues its deadline."""
+    room.game_instance.on_phase_timer = lambda game: schedule_phase_timer(room, game)
+    # A Game restored from a snapshot may be mid-phase, queue what is left of it
+    schedule_phase_timer(room, room.game_instance)
+
+
+def schedule_phase_timer(room, game):
+    if game.timers_disabled or not game.phase_end_time:
+        return
+    timer_scheduler.schedule(
+        game.phase_end_time, handle_phase_timeout, room, game, game.current_timer_id
+    )
+
+
+def handle_phase_timeout(room, game, timer_id):
+    """Fires once per phase; stale entries (phase moved on, game replaced) are dropped."""
+    # Checked under the room lock: a handler may be resolving this phase right now
+    with room.lock:
+        if room.game_instance is not game:
+            return
+        if game.expire_timer(timer_id) != "TIMEOUT":
+            return
+        with app.app_context(), outbox.collect():
+            log_and_emit(room, f"Timer expired for {game.phase}.")
+            if game.phase == PHASE_NIGHT:
+                resolve_night(room)
+            elif game.phase == PHASE_ACCUSATION:
+                perform_tally_accusations(room)
+            elif game.phase == PHASE_LYNCH:
+                resolve_lynch(room)
+
+
+rooms.on_game_created = watch_game
+
+
+def perform_tally_accusations(room):
+    if transition_pending(room):
+        return
+    with metrics.timer("tally_accusations"):
+        outcome = room.game_instance.tally_accusations()
     result_type = outcome["result"]
     if result_type == "trial":
         if outcome.get("message"):
             print(f"perform_tally_accusations message: {outcome.get('message')}")
-            socketio.emit("message", {"text": outcome["message"]}, to=game["game_code"])
+            socketio.emit("message", {"text": outcome["message"]}, to=room.game["game_code"])
 
         trial_msg = {
             "key": "events.trial_started",
             "variables": {"target": outcome["target_name"]},
         }
-        game_instance.message_history.append(trial_msg)
+        room.game_instance.message_history.append(trial_msg)
 
         socketio.emit(
             "lynch_vote_started",
             {
                 "target_id": outcome["target_id"],
                 "target_name": outcome["target_name"],
-                "phase_end_time": game_instance.phase_end_time,
+                "phase_end_time": room.game_instance.phase_end_time,
             },
-            to=game["game_code"],
+            to=room.game["game_code"],
         )
     elif result_type == "restart":
-        game_instance.message_history.append(outcome["message"])
+        room.game_instance.message_history.append(outcome["message"])
         socketio.emit(
-            "lynch_vote_result", {"message": outcome["message"]}, to=game["game_code"]
+            "lynch_vote_result", {"message": outcome["message"]}, to=room.game["game_code"]
         )
-        socketio.sleep(GAME_DEFAULTS["PAUSE_DURATION"])
-        game_instance.set_phase(PHASE_ACCUSATION)
-        broadcast_game_state()
+        continue_after_pause(room, restart_accusations)
 
     elif result_type == "night":
-        game_instance.message_history.append(outcome["message"])
+        room.game_instance.message_history.append(outcome["message"])
         # No Accusations / Deadlock -> Sleep
         socketio.emit(
-            "lynch_vote_result", {"message": outcome["message"]}, to=game["game_code"]
+            "lynch_vote_result", {"message": outcome["message"]}, to=room.game["game_code"]
         )
-        socketio.sleep(GAME_DEFAULTS["PAUSE_DURATION"])
-        broadcast_game_state()
+        continue_after_pause(room, broadcast_game_state)
+
+
+def restart_accusations(room):
+    room.game_instance.set_phase(PHASE_ACCUSATION)
+    broadcast_game_state(room)
 
 
 # --- HTTP Routes ---
@@ -459,29 +796,26 @@ def perform_tally_accusations():
 def index():
     # allow bypass if adding a player in PnP mode
     bypass_redirect = request.args.get("add_player")
+    room = get_room()
 
     # returning player redirect to game or lobby
     if (
         not bypass_redirect
+        and room
         and "player_id" in session
-        and session["player_id"] in game["players"]
+        and session["player_id"] in room.game["players"]
     ):
         return (
             redirect(url_for("game_page"))
-            if game["game_state"] != PHASE_LOBBY
+            if room.game["game_state"] != PHASE_LOBBY
             else redirect(url_for("lobby"))
         )
     # login properly then redirect to lobby
     if request.method == "POST":
         lang = request.form.get("language", "en")
         # join rate limiting
-        client_ip = request.headers.get("X-Forwarded-For", request.remote_addr)
-        current_time = time.time()
-        last_attempt_time = join_attempts.get(client_ip, 0)
-        if current_time - last_attempt_time < 2.0:
+        if not rate_limiter.allow("join", request.remote_addr):
             return render_template("index.html", error="Too many attempts. Please wait.")
-        # Update the timestamp for this IP
-        join_attempts[client_ip] = current_time
 
         raw_name = request.form.get("name", "").strip()
         name = html.escape(raw_name)
@@ -497,18 +831,27 @@ def index():
             return render_template("index.html", error=t_server("ui.login.error_code_alnum", lang))
         if len(code) > 20:
             return render_template("index.html", error=t_server("ui.login.error_code_length", lang))
-        if code != game["game_code"]:
-            return render_template("index.html", error=t_server("ui.login.error_code_invalid", lang))
-        if len(game["players"]) >= 32:
+        # Rooms are created on first connect, so an unknown code opens a new table
+        room = rooms.get(code)
+        if not room and rooms.is_full():
+            return render_template("index.html", error=t_server("ui.login.error_server_full", lang))
+        if room and len(room.game["players"]) >= 32:
              return render_template("index.html", error=t_server("ui.login.error_lobby_full", lang))
 
-        for p in game["players"].values():
-            if p.name.lower() == name.lower():
-                return render_template("index.html", error=t_server("ui.login.error_name_taken", lang))
+        if room:
+            for p in room.game["players"].values():
+                if p.name.lower() == name.lower():
+                    return render_template("index.html", error=t_server("ui.login.error_name_taken", lang))
 
         session["language"] = lang
+        session["game_code"] = code
         session["player_id"], session["name"] = str(uuid.uuid4()), name
-        return redirect(url_for("lobby"))
+        response = redirect(url_for("lobby"))
+        # Plain cookie (the session is signed) so nginx can route the table to its worker
+        response.set_cookie(
+            ROOM_COOKIE, code, samesite="Lax", secure=app.config["SESSION_COOKIE_SECURE"]
+        )
+        return response
     return render_template("index.html")
 
 
@@ -518,32 +861,39 @@ def lobby():
     # new player send to index
     if not player_id:
         return redirect(url_for("index"))
+    room = get_room()
+    # first player of a new table, room is created when the socket connects
+    if not room:
+        return render_template(
+            "lobby.html", player_id=player_id, game_code=session.get("game_code")
+        )
     # if game in session, send valid player to game else index
-    if game["game_state"] != PHASE_LOBBY:
+    if room.game["game_state"] != PHASE_LOBBY:
         return (
             redirect(url_for("game_page"))
-            if player_id in game["players"]
+            if player_id in room.game["players"]
             else redirect(url_for("index"))
         )
     # if no game in session, send to lobby
     return render_template(
-        "lobby.html", player_id=player_id, game_code=game["game_code"]
+        "lobby.html", player_id=player_id, game_code=room.game["game_code"]
     )
 
 
 @app.route("/game")
 def game_page():
     player_id = session.get("player_id")
+    room = get_room()
     # new player send to index
-    if not player_id or player_id not in game["players"]:
+    if not room or not player_id or player_id not in room.game["players"]:
         return redirect(url_for("index"))
     # if no game in session, send to lobby
-    if game["game_state"] == PHASE_LOBBY:
+    if room.game["game_state"] == PHASE_LOBBY:
         return redirect(url_for("lobby"))
     # returning player send to game
     role_str = "unknown"
-    if player_id in game_instance.players:
-        p = game_instance.players[player_id]
+    if player_id in room.game_instance.players:
+        p = room.game_instance.players[player_id]
         if p.role:
             role_str = p.role.name_key
     return render_template("game.html", player_role=role_str, player_id=player_id)
@@ -560,6 +910,21 @@ def favicon():
 def get_roles():
     return jsonify([cls().to_dict() for cls in AVAILABLE_ROLES.values()])
 
+def metrics_access_allowed():
+    if metrics_token:
+        sent = request.headers.get("Authorization", "")
+        return hmac.compare_digest(sent.encode(), f"Bearer {metrics_token}".encode())
+    # Proxied requests come from the proxy's address, so they never count as local
+    is_proxied = "X-Forwarded-For" in request.headers or "X-Real-IP" in request.headers
+    return request.remote_addr in ("127.0.0.1", "::1") and not is_proxied
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    if not metrics_access_allowed():
+        return "Forbidden", 403
+    return metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
 @app.route('/shutdown', methods=['POST'])
 def shutdown():
     socketio.stop()
@@ -580,116 +945,128 @@ def add_header(response):
 
 # --- SocketIO Events ---
 @socketio.on("admin_update_roles")
+@room_locked()
 def handle_admin_update_roles(data):
-    if request.sid != game["admin_sid"]:
+    room = get_room()
+    if not room or request.sid != room.game["admin_sid"]:
         return
     # 1. Update Server State
-    lobby_state["selected_roles"] = data.get("roles", [])
+    room.lobby_state["selected_roles"] = data.get("roles", [])
 
     # 2. Broadcast to ALL clients so their checkboxes update
-    emit("sync_roles", {"roles": lobby_state["selected_roles"]}, to=game["game_code"])
+    emit("sync_roles", {"roles": room.lobby_state["selected_roles"]}, to=room.game["game_code"])
 
 
 @socketio.on("admin_update_settings")
+@room_locked()
 def handle_admin_update_settings(data):
-    if request.sid != game["admin_sid"]:
+    room = get_room()
+    if not room or request.sid != room.game["admin_sid"]:
         return
 
     # Update lobby settings state
-    if "settings" not in lobby_state:
-        lobby_state["settings"] = {}
+    if "settings" not in room.lobby_state:
+        room.lobby_state["settings"] = {}
     for k, v in data.items():
-        lobby_state["settings"][k] = v
+        room.lobby_state["settings"][k] = v
 
     if "pg_mode" in data:
-        game_instance.pg_mode = data["pg_mode"]
+        room.game_instance.pg_mode = data["pg_mode"]
 
     # Broadcast updates to all clients in lobby
-    emit("sync_settings", lobby_state["settings"], to=game["game_code"])
+    emit("sync_settings", room.lobby_state["settings"], to=room.game["game_code"])
 
 
 @socketio.on("connect")
+@room_locked(get_or_create_room)
 def handle_connect(auth=None):
     player_id = session.get("player_id")
     if not player_id:
         return
+    room = get_or_create_room()
+    if not room:
+        return emit("error", {"message": "Server is full. Please try again later."})
+    room.touch()
 
     # This logic handles both new players joining the lobby and existing players reconnecting.
-    if player_id not in game["players"]:
-        if game["game_state"] != PHASE_LOBBY:
+    if player_id not in room.game["players"]:
+        if room.game["game_state"] != PHASE_LOBBY:
             return emit("error", {"message": "Game in progress."})
         lang = session.get("language", "en")
         new_player = PlayerWrapper(session.get("name"), request.sid, language=lang)
         # set first player in room to be admin, if no admin from previous match
         # OR if we are in Pass-and-Play mode, grant admin to the newly added player
         # so they can control the lobby from the single device
-        is_pnp = lobby_state.get("settings", {}).get("mode") == "pass_and_play"
-        if not game["admin_sid"] or is_pnp:
+        is_pnp = room.lobby_state.get("settings", {}).get("mode") == "pass_and_play"
+        # A restored admin keeps the role until they reconnect
+        if not (room.game["admin_sid"] or room.admin_id()) or is_pnp:
             new_player.is_admin = True
-            game["admin_sid"] = request.sid
-            log_and_emit(f"===> +++ New player Admin {new_player.name} added to game.")
-        game["players"][player_id] = new_player
-        log_and_emit(f"===> +++ New player {new_player.name} added to game.")
+            room.game["admin_sid"] = request.sid
+            log_and_emit(room, f"===> +++ New player Admin {new_player.name} added to game.")
+        room.game["players"][player_id] = new_player
+        rooms.bind_player(player_id, room.code)
+        rooms.bind_sid(request.sid, player_id)
+        log_and_emit(room, f"===> +++ New player {new_player.name} added to game.")
     # reconnecting player
     else:
-        game["players"][player_id].sid = request.sid
-        log_and_emit(f"===> Player {game['players'][player_id].name} reconnected.")
+        room.game["players"][player_id].sid = request.sid
+        room.game["players"][player_id].connected = True
+        rooms.bind_sid(request.sid, player_id)
+        room.game["players"][player_id].reset_sync()
+        log_and_emit(room, f"===> Player {room.game['players'][player_id].name} reconnected.")
         # reestablish admin for new game/rematch
-        if game["players"][player_id].is_admin:
-            game["admin_sid"] = request.sid
+        if room.game["players"][player_id].is_admin:
+            room.game["admin_sid"] = request.sid
             log_and_emit(
-                f"===> Admin {game['players'][player_id].name} confirmed and SID updated."
+                room,
+                f"===> Admin {room.game['players'][player_id].name} confirmed and SID updated."
             )
-    join_room(game["game_code"])
+    join_room(room.game["game_code"])
 
     # Sync client with the current state
-    if game["game_state"] == PHASE_LOBBY:
-        emit("sync_roles", {"roles": lobby_state["selected_roles"]}, to=request.sid)
-        emit("sync_settings", lobby_state.get("settings", {}), to=request.sid)
-        broadcast_player_list()
+    if room.game["game_state"] == PHASE_LOBBY:
+        emit("sync_roles", {"roles": room.lobby_state["selected_roles"]}, to=request.sid)
+        emit("sync_settings", room.lobby_state.get("settings", {}), to=request.sid)
+        broadcast_player_list(room)
     else:
-        player = game["players"][player_id]
+        player = room.game["players"][player_id]
+        player_obj = room.game_instance.players.get(player_id)
+        if player_obj:
+            sync_chat_channels(room, player_obj)
         log_and_emit(
-            f">>>> Game Phase: {game['game_state']}. Syncing state for {player.name}."
+            room,
+            f">>>> Game Phase: {room.game['game_state']}. Syncing state for {player.name}."
         )
-        broadcast_game_state()
-        send_werewolf_info(player_id)
-        send_cupid_info(player_id)
+        broadcast_game_state(room)
+        send_werewolf_info(room, player_id)
+        send_cupid_info(room, player_id)
 
 
 @socketio.on("disconnect")
+@room_locked()
 def handle_disconnect():
-    player_id, _ = get_player_by_sid(request.sid)
-    if player_id and player_id in game["players"]:
-        log_and_emit(f"==== Player {game['players'][player_id].name} disconnected ====")
-
-
-@socketio.on("join_game")
-def on_join(data):
-    room = data["room"]
-    join_room(room)
-    if "game_instance" in globals() and game_instance:
-        current_players = [p.name for p in game_instance.players.values()]
-    else:
-        current_players = []
-    emit("update_player_list", {"players": current_players}, to=room)
-
-
-last_message_time = {}
+    rate_limiter.forget(request.sid)
+    room = get_room()
+    if not room:
+        return
+    player_id, player_wrapper = get_player_by_sid(room, request.sid)
+    rooms.unbind_sid(request.sid)
+    if player_id and player_id in room.game["players"]:
+        player_wrapper.connected = False
+        room.touch()
+        log_and_emit(room, f"==== Player {room.game['players'][player_id].name} disconnected ====")
 
 
 @socketio.on("send_message")
+@room_locked()
 def handle_send_message(data):
-    current_time = time.time()
-    last_time = last_message_time.get(request.sid, 0)
-
-    # Enforce 0.5 second cooldown
-    if current_time - last_time < 0.5:
+    if not rate_limiter.allow("send_message", request.sid):
         return  # Silently ignore spam
 
-    last_message_time[request.sid] = current_time
-
-    pid, p = get_player_by_sid(request.sid)
+    room = get_room()
+    if not room:
+        return
+    pid, p = get_player_by_sid(room, request.sid)
     if not p:
         return
     raw_msg = data.get("message", "").strip()
@@ -698,17 +1075,33 @@ def handle_send_message(data):
         return emit("error", {"message": "Message too long."})
     if not msg:
         return
-    phase = game_instance.phase
+    phase = room.game_instance.phase
     is_night = phase == PHASE_NIGHT
 
+    # 1. Living werewolves plot among themselves at night, only their sids get it
+    wolf_chat_open = is_night and not room.game_instance.admin_only_chat
+    if (
+        wolf_chat_open
+        and room.game_instance.isPassAndPlay
+        and pid in room.game_instance.living_by_team.get("Werewolves", {})
+    ):
+        return emit("error", {"message": "Werewolf chat is not available in pass-and-play."})
+    if wolf_chat_open and in_werewolf_chat(room.game_instance, pid):
+        socketio.emit(
+            "new_message",
+            {"text": f"<strong>{p.name}:</strong> {msg}", "channel": "werewolves"},
+            to=room.channel("werewolves"),
+        )
+        return
+
     # 2. Check Restrictions (Admin Only OR Night Time)
-    if game_instance.admin_only_chat or is_night:
+    if room.game_instance.admin_only_chat or is_night:
         if p.is_admin:
             # Admin overrides restriction -> Sends as Announcement
             socketio.emit(
                 "new_message",
                 {"text": f"<strong>ADMIN:</strong> {msg}", "channel": "announcement"},
-                to=game["game_code"],
+                to=room.game["game_code"],
             )
         else:
             # Non-Admins get silenced
@@ -728,69 +1121,79 @@ def handle_send_message(data):
     # If Phase is LOBBY or GAME_OVER/ended, everyone talks in 'lobby' channel
     active_phases = [PHASE_ACCUSATION, PHASE_LYNCH]
     if phase in active_phases:
-        engine_p = game_instance.players.get(pid)
+        engine_p = room.game_instance.players.get(pid)
         if engine_p:
             channel = "living" if engine_p.is_alive else "ghost"
+    # Living and ghost chat only reach their own sub-room (see sync_chat_channels)
     socketio.emit(
         "new_message",
         {"text": f"<strong>{p.name}:</strong> {msg}", "channel": channel},
-        to=game["game_code"],
+        to=room.game["game_code"] if channel == "lobby" else room.channel(channel),
     )
 
 
 @socketio.on("admin_toggle_chat")
+@room_locked()
 def handle_admin_toggle_chat():
-    player_id, p = get_player_by_sid(request.sid)
+    room = get_room()
+    if not room:
+        return
+    player_id, p = get_player_by_sid(room, request.sid)
     if not p or not p.is_admin:
         return
-    game_instance.admin_only_chat = not game_instance.admin_only_chat
+    room.game_instance.admin_only_chat = not room.game_instance.admin_only_chat
+    room.game_instance.bump_version()
     emit(
         "chat_mode_update",
-        {"admin_only_chat": game_instance.admin_only_chat},
-        to=game["game_code"],
+        {"admin_only_chat": room.game_instance.admin_only_chat},
+        to=room.game["game_code"],
     )
 
 @socketio.on("admin_transfer_admin")
+@room_locked()
 def handle_admin_transfer(data):
-    if request.sid != game["admin_sid"]:
+    room = get_room()
+    if not room or request.sid != room.game["admin_sid"]:
         return
 
     target_id = data.get("target_id")
-    if not target_id or target_id not in game["players"]:
+    if not target_id or target_id not in room.game["players"]:
         return
 
     current_admin_id = session.get("player_id")
 
     # 1. Update wrappers
-    game["players"][current_admin_id].is_admin = False
-    game["players"][target_id].is_admin = True
+    room.game["players"][current_admin_id].is_admin = False
+    room.game["players"][target_id].is_admin = True
 
     # 2. Update Global SID
-    game["admin_sid"] = game["players"][target_id].sid
+    room.game["admin_sid"] = room.game["players"][target_id].sid
 
-    log_and_emit(f"===> Admin transferred from {game['players'][current_admin_id].name} to {game['players'][target_id].name}")
+    log_and_emit(room, f"===> Admin transferred from {room.game['players'][current_admin_id].name} to {room.game['players'][target_id].name}")
 
     # 3. Broadcast updates
-    if game["game_state"] == PHASE_LOBBY:
-        broadcast_player_list()
+    if room.game["game_state"] == PHASE_LOBBY:
+        broadcast_player_list(room)
         # Also need to send settings to new admin so their UI updates
-        emit("sync_settings", lobby_state.get("settings", {}), to=game["admin_sid"])
+        emit("sync_settings", room.lobby_state.get("settings", {}), to=room.game["admin_sid"])
     else:
-        broadcast_game_state()
+        broadcast_game_state(room)
 
 @socketio.on("admin_set_timers")
+@room_locked()
 def handle_admin_set_timers(data):
-    if request.sid != game["admin_sid"]:
+    room = get_room()
+    if not room or request.sid != room.game["admin_sid"]:
         return
 
-    if "settings" not in lobby_state:
-        lobby_state["settings"] = {}
+    if "settings" not in room.lobby_state:
+        room.lobby_state["settings"] = {}
 
     # Save disabled state if present
     if "timers_disabled" in data:
-        if "timers" not in lobby_state["settings"]:
-            lobby_state["settings"]["timers"] = {}
-        lobby_state["settings"]["timers"]["timers_disabled"] = data["timers_disabled"]
+        if "timers" not in room.lobby_state["settings"]:
+            room.lobby_state["settings"]["timers"] = {}
+        room.lobby_state["settings"]["timers"]["timers_disabled"] = data["timers_disabled"]
 
     # Save durations if present
     key_map = {
@@ -800,25 +1203,28 @@ def handle_admin_set_timers(data):
     }
 
     # Check if we are updating specific durations (from the 'Set Timers' button)
-    # If so, save them to lobby_state too
+    # If so, save them to room.lobby_state too
     has_duration_update = any(k in data for k in key_map.keys())
     if has_duration_update:
-        if "timers" not in lobby_state["settings"]:
-            lobby_state["settings"]["timers"] = {}
+        if "timers" not in room.lobby_state["settings"]:
+            room.lobby_state["settings"]["timers"] = {}
 
         for frontend_key in key_map.keys():
             if frontend_key in data:
-                lobby_state["settings"]["timers"][frontend_key] = data[frontend_key]
+                room.lobby_state["settings"]["timers"][frontend_key] = data[frontend_key]
 
     if "timers_disabled" in data:
-        game_instance.timers_disabled = data["timers_disabled"]
-        status = "Paused" if game_instance.timers_disabled else "Resumed"
-        log_and_emit(f"Admin has {status} the timers.")
+        room.game_instance.timers_disabled = data["timers_disabled"]
+        room.game_instance.bump_version()
+        status = "Paused" if room.game_instance.timers_disabled else "Resumed"
+        log_and_emit(room, f"Admin has {status} the timers.")
+        # Paused deadlines are dropped when they fire, so queue the current one again
+        schedule_phase_timer(room, room.game_instance)
         # Broadcast the new state so UI updates immediately
-        broadcast_game_state()
+        broadcast_game_state(room)
 
     # The numeric duration settings should generally only be changed in Lobby/Waiting
-    if game["game_state"] == PHASE_LOBBY:
+    if room.game["game_state"] == PHASE_LOBBY:
         updated_timers = {}
         key_map = {
             "accusation": PHASE_ACCUSATION,
@@ -831,62 +1237,69 @@ def handle_admin_set_timers(data):
                 try:
                     new_duration = int(val)
                     final_duration = max(10, new_duration)
-                    game_instance.timer_durations[engine_phase_key] = final_duration
+                    room.game_instance.timer_durations[engine_phase_key] = final_duration
                     updated_timers[frontend_key] = final_duration
                 except ValueError:
                     pass
         if updated_timers:
+            room.game_instance.bump_version()
             emit("admin_timers_updated", {"timers": updated_timers})
-            log_and_emit(f"Admin set new timer durations: {updated_timers}")
+            log_and_emit(room, f"Admin set new timer durations: {updated_timers}")
 
 
 @socketio.on("admin_exclude_player")
+@room_locked()
 def handle_admin_exclude_player(data):
-    if request.sid != game["admin_sid"] or game["game_state"] != PHASE_LOBBY:
+    room = get_room()
+    if (
+        not room
+        or request.sid != room.game["admin_sid"]
+        or room.game["game_state"] != PHASE_LOBBY
+    ):
         return
     player_id = data.get("player_id")
-    if player_id in game["players"]:
-        sid = game["players"][player_id].sid
-        del game["players"][player_id]
+    if player_id in room.game["players"]:
+        sid = room.game["players"][player_id].sid
+        del room.game["players"][player_id]
+        rooms.unbind_player(player_id)
         emit("force_kick", to=sid)
-    if player_id in game_instance.players:
-        del game_instance.players[player_id]
-    broadcast_player_list()
+    room.game_instance.remove_player(player_id)
+    broadcast_player_list(room)
 
 
 @socketio.on("start_game")
+@room_locked()
 def handle_start_game(data):
     settings = data.get("settings", {})
     is_pnp = settings.get("mode") == "pass_and_play"
+    room = get_room()
+    if not room:
+        return
 
-    if request.sid != game.get("admin_sid") and not is_pnp:
+    if request.sid != room.game.get("admin_sid") and not is_pnp:
         return emit("error", {"message": "Only the admin can start the game."})
-    if len(game["players"]) < GAME_DEFAULTS["MIN_PLAYERS"]:
+    if len(room.game["players"]) < GAME_DEFAULTS["MIN_PLAYERS"]:
         return emit(
             "error",
             {
                 "message": "Cannot start with fewer than {GAME_DEFAULTS['MIN_PLAYERS']} players."
             },
         )
-    if game.get("game_state") != PHASE_LOBBY:
+    if room.game.get("game_state") != PHASE_LOBBY:
         return emit("error", {"message": "Game is already in progress."})
-    log_and_emit("===> Admin started game. Assigning roles.")
-    global game_loop_running
-    if not game_loop_running:
-        game_loop_running = True
-        socketio.start_background_task(background_game_loop)
+    log_and_emit(room, "===> Admin started game. Assigning roles.")
     # configure engine
-    lobby_state["settings"] = settings
-    lobby_state["selected_roles"] = data.get("roles", [])
-    game_instance.settings = settings
-    game_instance.ghost_mode = settings.get("ghost_mode", False)
-    game_instance.mode = settings.get("mode", "standard")
-    game_instance.isPassAndPlay = game_instance.mode == "pass_and_play"
-    game_instance.pg_mode = settings.get("pg_mode", False)
+    room.lobby_state["settings"] = settings
+    room.lobby_state["selected_roles"] = data.get("roles", [])
+    room.game_instance.settings = settings
+    room.game_instance.ghost_mode = settings.get("ghost_mode", False)
+    room.game_instance.mode = settings.get("mode", "standard")
+    room.game_instance.isPassAndPlay = room.game_instance.mode == "pass_and_play"
+    room.game_instance.pg_mode = settings.get("pg_mode", False)
 
     # Optional: Apply timer settings immediately if they exist
     timers_settings = settings.get("timers", {})
-    game_instance.timer_durations = {
+    room.game_instance.timer_durations = {
         "Night": int(timers_settings.get("night", GAME_DEFAULTS["TIME_NIGHT"])),
         "Accusation": int(
             timers_settings.get("accusation", GAME_DEFAULTS["TIME_ACCUSATION"])
@@ -895,51 +1308,63 @@ def handle_start_game(data):
             timers_settings.get("lynch_vote", GAME_DEFAULTS["TIME_LYNCH"])
         ),
     }
-    game_instance.timers_disabled = timers_settings.get("timers_disabled", False)
-    game_instance.players = {}
-    for pid, obj in game["players"].items():
-        game_instance.add_player(pid, obj.name)
-    log_and_emit(f"===> Game Started! Mode: {game_instance.mode}")
-    game_instance.assign_roles(data.get("roles", []))
-    game["game_state"] = "started"
-    socketio.emit("game_started", to=game["game_code"])
-    game_instance.set_phase(PHASE_NIGHT)
-    broadcast_game_state()
+    room.game_instance.timers_disabled = timers_settings.get("timers_disabled", False)
+    room.game_instance.clear_players()
+    for pid, obj in room.game["players"].items():
+        room.game_instance.add_player(pid, obj.name)
+    log_and_emit(room, f"===> Game Started! Mode: {room.game_instance.mode}")
+    room.game_instance.assign_roles(data.get("roles", []))
+    if journal_dir:
+        journal_path = join(journal_dir, f"{room.code}-{int(time.time())}.wwj")
+        room.game_instance.start_journal(Journal(journal_path))
+    for player_obj in room.game_instance.players.values():
+        sync_chat_channels(room, player_obj)
+    room.game["game_state"] = "started"
+    socketio.emit("game_started", to=room.game["game_code"])
+    room.game_instance.set_phase(PHASE_NIGHT)
+    broadcast_game_state(room)
 
 
 @socketio.on("admin_next_phase")
+@room_locked()
 def handle_admin_next_phase(data=None):
-    player_id, p = get_player_by_sid(request.sid)
+    room = get_room()
+    if not room or transition_pending(room):
+        return
+    player_id, p = get_player_by_sid(room, request.sid)
     is_pnp = data.get("is_pnp", None) if data else None
     if not is_pnp:
         if not p or not p.is_admin:
             return
 
-    current_phase = game_instance.phase
-    log_and_emit(f"Admin is advancing the phase from {current_phase}.")
+    current_phase = room.game_instance.phase
+    log_and_emit(room, f"Admin is advancing the phase from {current_phase}.")
     if current_phase == PHASE_NIGHT:
-        resolve_night()
+        resolve_night(room)
     elif current_phase == PHASE_ACCUSATION:
-        perform_tally_accusations()
+        perform_tally_accusations(room)
     elif current_phase == PHASE_LYNCH:
-        resolve_lynch()
+        resolve_lynch(room)
 
-def resolve_lynch():
-    result = game_instance.resolve_lynch_vote()
+def resolve_lynch(room):
+    if transition_pending(room):
+        return
+    with metrics.timer("resolve_lynch_vote"):
+        result = room.game_instance.resolve_lynch_vote()
 
     # 1. Handle Announcements (if any)
     if result.get("announcements"):
         for ann in result["announcements"]:
-            game_instance.message_history.append(ann)
-            socketio.emit("message", {"text": ann}, to=game["game_code"])
+            room.game_instance.message_history.append(ann)
+            socketio.emit("message", {"text": ann}, to=room.game["game_code"])
 
     # 2. Determine Primary Lynch Result
     msg = {"key": "events.lynch_fail", "variables": {}}
     if result.get("armor_save"):
         msg = {"key": "events.lynch_armor", "variables": {}}
     elif result["killed_id"]:
-        name = game_instance.players[result["killed_id"]].name
-        role = game_instance.players[result["killed_id"]].role.name_key
+        name = room.game_instance.players[result["killed_id"]].name
+        role = room.game_instance.players[result["killed_id"]].role.name_key
         msg = {
             "key": "events.lynch_success",
             "variables": {"name": name, "role": role}
@@ -949,7 +1374,7 @@ def resolve_lynch():
     if result.get("summary"):
         msg["summary"] = result["summary"]
 
-    game_instance.message_history.append(msg)
+    room.game_instance.message_history.append(msg)
 
     socketio.emit(
         "lynch_vote_result",
@@ -958,7 +1383,7 @@ def resolve_lynch():
             "summary": result["summary"],
             "killed_id": result["killed_id"],
         },
-        to=game["game_code"],
+        to=room.game["game_code"],
     )
 
     # 3. Handle Secondary Deaths (Honeypot, Lovers, etc.)
@@ -966,8 +1391,8 @@ def resolve_lynch():
         for d in result["secondary_deaths"]:
             # Attempt to find the role for the translation key (game engine might not send it in 'd')
             role_key = "Unknown"
-            if "id" in d and d["id"] in game_instance.players:
-                r = game_instance.players[d["id"]].role
+            if "id" in d and d["id"] in room.game_instance.players:
+                r = room.game_instance.players[d["id"]].role
                 if r: role_key = r.name_key
             elif "role" in d:
                 role_key = d["role"]
@@ -1002,35 +1427,37 @@ def resolve_lynch():
                     "variables": {"name": d["name"], "reason": str(reason_raw)}
                 }
 
-            game_instance.message_history.append(sec_msg)
-            socketio.emit("message", {"text": sec_msg}, to=game["game_code"])
+            room.game_instance.message_history.append(sec_msg)
+            socketio.emit("message", {"text": sec_msg}, to=room.game["game_code"])
 
     # 4. Update Wolf Team & Check Game Over
-    living_wolves = game_instance.get_living_players("Werewolves")
+    living_wolves = room.game_instance.get_living_players("Werewolves")
     for werewolf in living_wolves:
-        send_werewolf_info(werewolf.id)
+        send_werewolf_info(room, werewolf.id)
 
-    socketio.sleep(GAME_DEFAULTS["PAUSE_DURATION"])
-    check_game_over_or_next_phase()
+    continue_after_pause(room, check_game_over_or_next_phase)
 
-def check_game_over_or_next_phase():
-    if game_instance.check_game_over():
-        game_instance.phase = PHASE_GAME_OVER
-        game["game_state"] = PHASE_GAME_OVER
-        data = game_instance.game_over_data
+def check_game_over_or_next_phase(room):
+    if room.game_instance.check_game_over():
+        room.game_instance.phase = PHASE_GAME_OVER
+        room.game_instance.bump_version()
+        room.game["game_state"] = PHASE_GAME_OVER
+        data = room.game_instance.game_over_data
         if data:
-            game["game_over_data"] = data
+            room.game["game_over_data"] = data
             winner = data.get("winning_team", "Unknown")
-            log_and_emit(f"Game Over! The {winner} have won.")
+            log_and_emit(room, f"Game Over! The {winner} have won.")
     else:
-        game_instance.advance_phase()
-    broadcast_game_state()
+        room.game_instance.advance_phase()
+    broadcast_game_state(room)
 
 
 @socketio.on("admin_set_new_code")
+@room_locked()
 def handle_admin_set_new_code(data):
     """Handles admin setting a new game code, keeping admin in lobby and kicking others."""
-    if request.sid != game.get("admin_sid"):
+    room = get_room()
+    if not room or request.sid != room.game.get("admin_sid"):
         return
     new_code = data.get("new_code", "").strip().upper()
     if not new_code:
@@ -1041,49 +1468,64 @@ def handle_admin_set_new_code(data):
         )
     if len(new_code) > 20:
         return emit("error", {"message": "Code must be 20 characters or fewer."})
-    admin_id, admin_player = get_player_by_sid(request.sid)
+    admin_id, admin_player = get_player_by_sid(room, request.sid)
     if not admin_player:
         return
+    old_code = room.code
+    if new_code != old_code and new_code in rooms:
+        return emit("error", {"message": "Code is already in use by another game."})
+
+    if socketio_message_queue and new_code != old_code:
+        # The new code may hash to another worker, so the admin re-logs in too
+        # and the table starts fresh wherever the new code is owned
+        socketio.emit("force_relogin", {"new_code": new_code}, to=old_code)
+        close_table_rooms(room)
+        rooms.remove(old_code)
+        return
 
     # Notify all OTHER players to re-login
     socketio.emit(
         "force_relogin",
         {"new_code": new_code},
-        to=game["game_code"],
+        to=old_code,
         skip_sid=request.sid,
     )
-    global game_instance
-    game_instance = Game("main_game_")
     # Reset the game, preserving only the admin
-    admin_conn = game["players"][session["player_id"]]
-    game["players"] = {session["player_id"]: admin_conn}
-    game["game_code"] = new_code
-    game["game_state"] = PHASE_LOBBY
+    for pid in room.game["players"]:
+        if pid != admin_id:
+            rooms.unbind_player(pid)
+    room.game["players"] = {admin_id: admin_player}
+    if new_code != old_code:
+        # Nobody may stay in the old code's rooms, another table can take it
+        close_table_rooms(room)
+        rooms.rename(old_code, new_code)
+    room.reset_game()
+    room.game["game_state"] = PHASE_LOBBY
 
     # Update the admin's lobby view
     join_room(new_code)
-    broadcast_player_list()
+    broadcast_player_list(room)
 
 
-def send_cupid_info(player_id, specific_sid=None):
+def send_cupid_info(room, player_id, specific_sid=None):
     """
     Checks if the player has a lover and sends the cupid_info event.
     Can send to a specific SID (for PnP/Reconnects) or look up the current SID.
     """
     # 1. Get Engine Object
-    engine_player_obj = game_instance.players.get(player_id)
+    engine_player_obj = room.game_instance.players.get(player_id)
     if not engine_player_obj or not engine_player_obj.linked_partner_id:
         return
 
     # 2. Get Partner Object
-    partner_obj = game_instance.players.get(engine_player_obj.linked_partner_id)
+    partner_obj = room.game_instance.players.get(engine_player_obj.linked_partner_id)
     if not partner_obj:
         return
 
     # 3. Determine Target SID
     target_sid = specific_sid
     if not target_sid:
-        player_wrapper = game["players"].get(player_id)
+        player_wrapper = room.game["players"].get(player_id)
         if player_wrapper:
             target_sid = player_wrapper.sid
 
@@ -1103,9 +1545,9 @@ def send_cupid_info(player_id, specific_sid=None):
         socketio.emit("cupid_info", {"message": msg}, to=target_sid)
 
 
-def send_werewolf_info(player_id, specific_sid=None):
+def send_werewolf_info(room, player_id, specific_sid=None):
     """Sends the list of werewolf teammates to a specific player."""
-    engine_player_obj = game_instance.players.get(player_id)
+    engine_player_obj = room.game_instance.players.get(player_id)
     if (
         not engine_player_obj
         or not engine_player_obj.role
@@ -1113,12 +1555,12 @@ def send_werewolf_info(player_id, specific_sid=None):
     ):
         return
 
-    living_werewolves = game_instance.get_living_players("Werewolves")
+    living_werewolves = room.game_instance.get_living_players("Werewolves")
     teammate_names = [w.name for w in living_werewolves if w.id != player_id]
 
     target_sid = specific_sid
     if not target_sid:
-        player_wrapper = game["players"].get(player_id)
+        player_wrapper = room.game["players"].get(player_id)
         if player_wrapper:
             target_sid = player_wrapper.sid
 
@@ -1130,83 +1572,139 @@ def send_werewolf_info(player_id, specific_sid=None):
 
 # --- PnP Specific Listeners ---
 @socketio.on("pnp_request_state")
+@room_locked()
 def handle_pnp_request(data):
     """
     Called when PnP device clicks a player button.
     Sends that specific player's FULL private state (using generator).
     """
+    room = get_room()
+    if not room:
+        return
     target_id = data.get("player_id")
-    payload = generate_player_payload(target_id)
+    payload = generate_player_payload(room, target_id)
     if payload:
         emit("pnp_state_sync", payload)
-        send_werewolf_info(target_id, specific_sid=request.sid)
-        send_cupid_info(target_id, specific_sid=request.sid)
+        send_werewolf_info(room, target_id, specific_sid=request.sid)
+        send_cupid_info(room, target_id, specific_sid=request.sid)
 
 
 @socketio.on("pnp_submit_action")
+@room_locked()
 def handle_pnp_action(data):
     """
     Unified action handler for Pass-and-Play.
     """
     print(f"handle_pnp_action")
-    result = game_instance.receive_night_action(
+    room = get_room()
+    if not room or transition_pending(room):
+        return
+    result = room.game_instance.receive_night_action(
         data.get("actor_id"), data.get("target_id")
     )
     if result == "RESOLVED":
-        socketio.sleep(GAME_DEFAULTS["PAUSE_DURATION"])
-        resolve_night()
+        continue_after_pause(room, resolve_night)
     else:
         # Confirm receipt to client so they can show "Passed" screen
         emit("action_accepted", {}, to=request.sid)
 
 
 @socketio.on("client_ready_for_game")
+@room_locked()
 def handle_client_ready_for_game():
     """
     Syncs the game state for the specific client requesting it.
     """
     player_id = session.get("player_id")
-    if not player_id or player_id not in game["players"]:
+    room = get_room()
+    if not room or not player_id or player_id not in room.game["players"]:
         return
 
     # OPTIMIZATION: Only update the requester, not the whole server
-    player_wrapper = game["players"][player_id]
-    payload = generate_player_payload(player_id, player_wrapper)
+    player_wrapper = room.game["players"][player_id]
+    payload = generate_player_payload(room, player_id, player_wrapper)
 
+    # Explicit request (page load or version gap): always a full state
     if payload:
-        emit("game_state_sync", payload, to=player_wrapper.sid)
+        send_state_sync(player_wrapper, payload, full=True)
+
+
+@socketio.on("history_since")
+@room_locked()
+def handle_history_since(data):
+    """Sends the public message history entries newer than the client's last seq."""
+    room = get_room()
+    if not room:
+        return
+    seq = data.get("seq", 0) if isinstance(data, dict) else 0
+    if not isinstance(seq, int) or seq < 0:
+        seq = 0
+
+    history = room.game_instance.message_history
+    # A seq ahead of ours means the client saw a previous game: start over
+    reset = seq > history.last_seq
+    if reset:
+        seq = 0
+    emit(
+        "history_entries",
+        {
+            "entries": history.since(seq),
+            "last_seq": history.last_seq,
+            "reset": reset,
+        },
+    )
+
+
+@socketio.on("state_ack")
+@room_locked()
+def handle_state_ack(data):
+    """Records the last state version the client applied."""
+    room = get_room()
+    if not room:
+        return
+    player_id, player_wrapper = get_player_by_sid(room, request.sid)
+    if not player_wrapper:
+        return
+    version = data.get("version") if isinstance(data, dict) else None
+    if isinstance(version, int) and version <= player_wrapper.state_version:
+        player_wrapper.acked_version = version
 
 
 @socketio.on("hero_choice")
+@room_locked()
 def handle_hero_choice(data):
+    room = get_room()
+    # Results of the last phase are still on screen, see continue_after_pause
+    if not room or transition_pending(room):
+        return
     player_id = session.get("player_id")
     # PnP Override
-    if game_instance.mode == "pass_and_play" and "actor_id" in data:
+    if room.game_instance.mode == "pass_and_play" and "actor_id" in data:
         player_id = data["actor_id"]
     target_id = data.get("target_id")
     if target_id == "Nobody":
-        result = game_instance.receive_night_action(player_id, "Nobody")
+        result = room.game_instance.receive_night_action(player_id, "Nobody")
     else:
-        result = game_instance.receive_night_action(player_id, data)
+        result = room.game_instance.receive_night_action(player_id, data)
     if result == "ALREADY_ACTED":
         # In PnP, refresh the specific actor, otherwise broadcast
-        if game_instance.mode == "pass_and_play":
-            payload = generate_player_payload(player_id)
+        if room.game_instance.mode == "pass_and_play":
+            payload = generate_player_payload(room, player_id)
             if payload:
                 return emit("pnp_state_sync", payload)
-        return broadcast_game_state()
+        return broadcast_game_state(room)
     if result == "IGNORED":
         return emit("error", {"message": "Action ignored."})
     if result == "RESOLVED":
-        return resolve_night()
-    player_obj = game_instance.players.get(player_id)
+        return resolve_night(room)
+    player_obj = room.game_instance.players.get(player_id)
     if player_obj and player_obj.role.name_key in [
         ROLE_SEER,
         ROLE_RANDOM_SEER,
         ROLE_SORCERER,
     ]:
         # Immediate Seer Feedback (Standard Mode Feature)
-        target_player_obj = game_instance.players.get(target_id)
+        target_player_obj = room.game_instance.players.get(target_id)
         if target_player_obj and hasattr(player_obj.role, "investigate"):
             emit(
                 "seer_result",
@@ -1215,32 +1713,36 @@ def handle_hero_choice(data):
                     "role": player_obj.role.investigate(target_player_obj),
                 },
             )
-    if game_instance.mode == "pass_and_play":
+    if room.game_instance.mode == "pass_and_play":
         emit("pnp_action_confirmed", {})
-        socketio.emit("pnp_player_done", {"player_id": player_id}, to=game["game_code"])
+        socketio.emit("pnp_player_done", {"player_id": player_id}, to=room.game["game_code"])
     else:
-        broadcast_game_state()
+        broadcast_game_state(room)
 
 
 @socketio.on("accuse_player")
+@room_locked()
 def handle_accuse_player(data):
+    room = get_room()
+    if not room or transition_pending(room):
+        return
     pid = session.get("player_id")
-    if game_instance.mode == "pass_and_play" and "actor_id" in data:
+    if room.game_instance.mode == "pass_and_play" and "actor_id" in data:
         pid = data["actor_id"]
     tid = data.get("target_id")
-    all_voted = game_instance.process_accusation(pid, tid)
+    all_voted = room.game_instance.process_accusation(pid, tid)
     # 2. Check what was recorded
-    recorded_vote = game_instance.pending_actions.get(pid)
+    recorded_vote = room.game_instance.pending_actions.get(pid)
     if recorded_vote == "Ghost_Fail":
         # update ghost to "wails went unheard"
         emit("force_phase_update", to=request.sid)
     elif recorded_vote is not None:
-        accuser = game_instance.players[pid]
+        accuser = room.game_instance.players[pid]
         accuser_name = accuser.name
         if not accuser.is_alive:
             accuser_name = "👻Ghost"
         if tid:
-            target = game_instance.players.get(tid)
+            target = room.game_instance.players.get(tid)
             target_name = target.name if target else "Unknown"
         else:
             target_name = "Nobody"
@@ -1249,7 +1751,7 @@ def handle_accuse_player(data):
             "key": "events.accusation_made",
             "variables": {"accuser": accuser_name, "target": target_name},
         }
-        game_instance.message_history.append(hist_msg)
+        room.game_instance.message_history.append(hist_msg)
         emit(
             "accusation_made",
             {
@@ -1258,39 +1760,46 @@ def handle_accuse_player(data):
                 "accused_name": target_name,
                 "accused_id": tid,
             },
-            to=game["game_code"],
+            to=room.game["game_code"],
         )
-    counts = Counter(game_instance.pending_actions.values())
-    emit("accusation_update", counts, to=game["game_code"])
+    counts = Counter(room.game_instance.pending_actions.values())
+    emit("accusation_update", counts, to=room.game["game_code"])
     if all_voted:
-        perform_tally_accusations()
-    elif game_instance.mode == "pass_and_play":
+        perform_tally_accusations(room)
+    elif room.game_instance.mode == "pass_and_play":
         emit("pnp_action_confirmed", {})
-        socketio.emit("pnp_player_done", {"player_id": pid}, to=game["game_code"])
+        socketio.emit("pnp_player_done", {"player_id": pid}, to=room.game["game_code"])
 
 
 @socketio.on("cast_lynch_vote")
+@room_locked()
 def handle_cast_lynch_vote(data):
+    room = get_room()
+    if not room or transition_pending(room):
+        return
     pid = session.get("player_id")
-    if game_instance.mode == "pass_and_play" and "actor_id" in data:
+    if room.game_instance.mode == "pass_and_play" and "actor_id" in data:
         pid = data["actor_id"]
-    all_voted = game_instance.cast_lynch_vote(pid, data.get("vote"))
+    all_voted = room.game_instance.cast_lynch_vote(pid, data.get("vote"))
     if all_voted:
-        resolve_lynch()
-    elif game_instance.mode == "pass_and_play":
+        resolve_lynch(room)
+    elif room.game_instance.mode == "pass_and_play":
         emit("pnp_action_confirmed", {})
-        socketio.emit("pnp_player_done", {"player_id": pid}, to=game["game_code"])
+        socketio.emit("pnp_player_done", {"player_id": pid}, to=room.game["game_code"])
 
 
 # --- Resolution ---
 
 
-def resolve_night():
-    events = game_instance.resolve_night_deaths()
+def resolve_night(room):
+    if transition_pending(room):
+        return
+    with metrics.timer("resolve_night_deaths"):
+        events = room.game_instance.resolve_night_deaths()
 
     # Notify Lovers
-    for player_id in game_instance.players:
-        send_cupid_info(player_id)
+    for player_id in room.game_instance.players:
+        send_cupid_info(room, player_id)
 
     # since deaths may also contain "armor_save"
     actual_death = False
@@ -1300,11 +1809,11 @@ def resolve_night():
 
             if event_type == "armor_save":
                 msg = {"key": "events.strangely", "variables": {}}
-                game_instance.message_history.append(msg)
-                socketio.emit("message", {"text": msg}, to=game["game_code"])
+                room.game_instance.message_history.append(msg)
+                socketio.emit("message", {"text": msg}, to=room.game["game_code"])
 
             elif event_type == "blocked":
-                player_wrapper = game["players"].get(event["id"])
+                player_wrapper = room.game["players"].get(event["id"])
                 if player_wrapper and player_wrapper.sid:
                     socketio.emit(
                         "message",
@@ -1313,11 +1822,11 @@ def resolve_night():
                     )
             elif event_type == "announcement":
                 msg = event["message"]
-                game_instance.message_history.append(msg)
+                room.game_instance.message_history.append(msg)
                 socketio.emit(
                     "message",
                     {"text": msg},
-                    to=game["game_code"],
+                    to=room.game["game_code"],
                 )
             elif event_type == "death":
                 actual_death = True
@@ -1349,41 +1858,44 @@ def resolve_night():
                     hist_msg["variables"]["reason"] = reason.replace(
                         "Honeypot retaliation: ", ""
                     )
-                game_instance.message_history.append(hist_msg)
+                room.game_instance.message_history.append(hist_msg)
 
                 socketio.emit(
                     "night_result_kill",
                     {
                         "killed_player": event,
-                        "admin_only_chat": game_instance.admin_only_chat,
-                        "phase": game_instance.phase,
+                        "admin_only_chat": room.game_instance.admin_only_chat,
+                        "phase": room.game_instance.phase,
                         "message": hist_msg,
                     },
-                    to=game["game_code"],
+                    to=room.game["game_code"],
                 )
                 # msg werewolf teamates in case Wild_Child joined
-                living_wolves = game_instance.get_living_players("Werewolves")
+                living_wolves = room.game_instance.get_living_players("Werewolves")
                 for werewolf in living_wolves:
-                    send_werewolf_info(werewolf.id)
+                    send_werewolf_info(room, werewolf.id)
 
     if not actual_death:
         msg = {"key": "events.sun_rise_safe", "variables": {}}
-        game_instance.message_history.append(msg)
-        socketio.emit("message", {"text": msg}, to=game["game_code"])
+        room.game_instance.message_history.append(msg)
+        socketio.emit("message", {"text": msg}, to=room.game["game_code"])
 
-    socketio.sleep(GAME_DEFAULTS["PAUSE_DURATION"])
-    check_game_over_or_next_phase()
+    continue_after_pause(room, check_game_over_or_next_phase)
 
 
 @socketio.on("vote_to_end_day")
+@room_locked()
 def handle_vote_to_end_day(data=None):
+    room = get_room()
+    if not room or transition_pending(room):
+        return
     pid = session.get("player_id")
     # PnP Override
-    if data and game_instance.mode == "pass_and_play" and "actor_id" in data:
+    if data and room.game_instance.mode == "pass_and_play" and "actor_id" in data:
         pid = data["actor_id"]
 
     # 1. Get the Engine Player Object
-    engine_player = game_instance.players.get(pid)
+    engine_player = room.game_instance.players.get(pid)
     if not engine_player:
         return
 
@@ -1391,51 +1903,62 @@ def handle_vote_to_end_day(data=None):
     # Only ALIVE players should control the day/night cycle speed.
     if not engine_player.is_alive:
         return
-    if game_instance.phase != PHASE_ACCUSATION:
+    if room.game_instance.phase != PHASE_ACCUSATION:
         return
 
     # 4. Add Vote (Manually add to the set)
-    game_instance.end_day_votes.add(pid)
-    living_count = len(game_instance.get_living_players())
-    votes_count = len(game_instance.end_day_votes)
+    room.game_instance.end_day_votes.add(pid)
+    room.game_instance.bump_version()
+    living_count = room.game_instance.count_living()
+    votes_count = len(room.game_instance.end_day_votes)
     majority = votes_count > (living_count / 2)
     emit(
         "end_day_vote_update",
         {"count": votes_count, "total": living_count},
-        to=game["game_code"],
+        to=room.game["game_code"],
     )
     if majority:
-        perform_tally_accusations()
-    elif game_instance.mode == "pass_and_play":
+        perform_tally_accusations(room)
+    elif room.game_instance.mode == "pass_and_play":
         emit("pnp_action_confirmed", {})
 
 
 # handle voting process after game ends. tracks votes, upon
 # majority , resets game state and redirects all to lobby
 @socketio.on("vote_for_rematch")
+@room_locked()
 def handle_vote_for_rematch():
-    global game_instance
-    player_id, p = get_player_by_sid(request.sid)
-    if not p or game["game_state"] != PHASE_GAME_OVER:
+    room = get_room()
+    if not room:
+        return
+    player_id, p = get_player_by_sid(room, request.sid)
+    if not p or room.game["game_state"] != PHASE_GAME_OVER:
         return
-    if player_id not in game_instance.rematch_votes:
-        game_instance.rematch_votes.add(player_id)
-        num_votes = len(game_instance.rematch_votes)
-        total_players = len(game["players"])
+    if player_id not in room.game_instance.rematch_votes:
+        room.game_instance.rematch_votes.add(player_id)
+        room.game_instance.bump_version()
+        num_votes = len(room.game_instance.rematch_votes)
+        total_players = len(room.game["players"])
         if num_votes > total_players / 2 or p.is_admin:
-            old_settings = getattr(game_instance, "settings", {})
-            game_instance = Game("main_game", settings=old_settings)
-            game_instance.players = {}
-            for pid, obj in game["players"].items():
-                game_instance.add_player(pid, obj.name)
-            game["game_state"] = PHASE_LOBBY
-            game["game_over_data"] = None
-            socketio.emit("redirect_to_lobby", {}, to=game["game_code"])
-            broadcast_player_list()
+            old_settings = getattr(room.game_instance, "settings", {})
+            room.reset_game(settings=old_settings)
+            room.game_instance.clear_players()
+            for pid, obj in room.game["players"].items():
+                room.game_instance.add_player(pid, obj.name)
+            room.game["game_state"] = PHASE_LOBBY
+            room.game["game_over_data"] = None
+            socketio.emit("redirect_to_lobby", {}, to=room.game["game_code"])
+            broadcast_player_list(room)
         else:
             # Broadcast the current vote count
             payload = {"count": num_votes, "total": total_players}
-            emit("rematch_vote_update", payload, to=game["game_code"])
+            emit("rematch_vote_update", payload, to=room.game["game_code"])
+
+
+# Wrap every handler registered above (keep this after the last @socketio.on)
+# Outbox goes first so the metrics wrapper times the flush and counts "batch" frames
+outbox.install(socketio)
+metrics.instrument_socketio(socketio)
 
 
 # for android
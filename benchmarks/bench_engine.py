@@ -0,0 +1,291 @@
+"""
+bench_engine.py
+Version: 1.0.0
+Reproducible timings for the engine hot paths at 4, 16 and 32 players
+(32 is the lobby cap in index()), with every role in AVAILABLE_ROLES selected.
+Each sample rebuilds its game from a fixed seed, only the measured call is timed.
+
+Usage (from the repository root):
+    python benchmarks/bench_engine.py                  # print timings
+    python benchmarks/bench_engine.py --save           # write benchmarks/baselines.json
+    python benchmarks/bench_engine.py --compare        # fail if slower than the baseline
+Baselines are machine specific. --compare scales them by a fixed CPU calibration
+loop timed with the baseline, so another machine's baseline only catches large
+slowdowns; re-save them on the machine that runs --compare for tight checks.
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from game_engine import Game, PHASE_ACCUSATION, PHASE_NIGHT  # noqa: E402
+from roles import AVAILABLE_ROLES  # noqa: E402
+from simulator import NullWriter, RandomPolicy  # noqa: E402
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+PLAYER_COUNTS = (4, 16, 32)
+ALL_ROLE_KEYS = [getattr(cls, "name_key", name) for name, cls in AVAILABLE_ROLES.items()]
+
+
+# --- Fixtures ---
+def build_game(num_players, seed):
+    """Fresh game at the start of night 1, every role selected."""
+    game = Game(f"BENCH{num_players}", seed=seed)
+    for i in range(num_players):
+        game.add_player(f"p{i}", f"P{i + 1}")
+    game.assign_roles(ALL_ROLE_KEYS)
+    game.set_phase(PHASE_NIGHT)
+    return game
+
+
+def submit_night_actions(game, seed):
+    policy = RandomPolicy()
+    policy.seed(seed)
+    game_context = game.build_context()
+    for player in game.get_living_players():
+        if player.role.is_night_active:
+            game.receive_night_action(player.id, policy.night_action(game, player, game_context))
+
+
+def link_chains(game):
+    """Lovers and Prostitute visits between neighbours so deaths chain through the cascade."""
+    players = list(game.players.values())
+    for a, b in zip(players[0::2], players[1::2]):
+        a.linked_partner_id = b.id
+        b.linked_partner_id = a.id
+    for a, b in zip(players[1::2], players[2::2]):
+        a.visiting_id = b.id
+        b.visiting_id = a.id
+
+
+def build_room(num_players, seed):
+    """Room with connected wrappers around a night-1 game, for the app.py paths."""
+    import app
+    from rooms import Room
+
+    room = Room(f"BENCH{num_players}")
+    room.game_instance = build_game(num_players, seed)
+    for player_id, player in room.game_instance.players.items():
+        room.game["players"][player_id] = app.PlayerWrapper(player.name, f"sid-{player_id}")
+    submit_night_actions(room.game_instance, seed)
+    return app, room
+
+
+# --- Benchmarks: setup(num_players, seed) -> state, run(state) ---
+def setup_cascade(num_players, seed):
+    game = build_game(num_players, seed)
+    link_chains(game)
+    targets = [(p.id, "Werewolf meat") for p in game.players.values() if p.role.team != "Werewolves"]
+    return game, targets
+
+
+def run_cascade(state):
+    game, targets = state
+    game.execute_death_cascade(targets, context="night")
+
+
+def setup_night(num_players, seed):
+    game = build_game(num_players, seed)
+    submit_night_actions(game, seed)
+    return game
+
+
+def run_night(game):
+    game.resolve_night_deaths()
+
+
+def setup_tally(num_players, seed):
+    game = build_game(num_players, seed)
+    game.set_phase(PHASE_ACCUSATION)
+    rng = random.Random(seed)
+    living = [p.id for p in game.get_living_players()]
+    for player_id in living:
+        game.process_accusation(player_id, rng.choice(living))
+    return game
+
+
+def run_tally(game):
+    game.tally_accusations()
+
+
+def setup_game_over(num_players, seed):
+    game = build_game(num_players, seed)
+    submit_night_actions(game, seed)
+    game.resolve_night_deaths()
+    game.winner = None
+    return game
+
+
+def run_game_over(game):
+    game.winner = None
+    game.check_game_over()
+
+
+def setup_payloads(num_players, seed):
+    return build_room(num_players, seed)
+
+
+def run_payloads(state):
+    """One payload per player, what a single broadcast builds."""
+    app, room = state
+    public_data = app.get_public_game_state(room)
+    for player_id, player_wrapper in room.game["players"].items():
+        app.generate_player_payload(room, player_id, player_wrapper, public_data=public_data)
+
+
+def run_resync(state):
+    """Every player asks for its state at once (reconnect storm), no shared public data."""
+    app, room = state
+    for player_id in room.game["players"]:
+        app.generate_player_payload(room, player_id)
+
+
+def setup_broadcast(num_players, seed):
+    app, room = build_room(num_players, seed)
+    app.broadcast_game_state(room)  # first sync is full
+    # Ack it like handle_state_ack, so the timed broadcast takes the steady-state delta path
+    for player_wrapper in room.game["players"].values():
+        player_wrapper.acked_version = player_wrapper.state_version
+    return app, room
+
+
+def run_broadcast(state):
+    app, room = state
+    app.broadcast_game_state(room)
+
+
+BENCHMARKS = {
+    "execute_death_cascade": (setup_cascade, run_cascade),
+    "resolve_night_deaths": (setup_night, run_night),
+    "tally_accusations": (setup_tally, run_tally),
+    "check_game_over": (setup_game_over, run_game_over),
+    "generate_player_payload": (setup_payloads, run_payloads),
+    "resync_storm": (setup_payloads, run_resync),
+    "broadcast_game_state": (setup_broadcast, run_broadcast),
+}
+
+
+# --- Runner ---
+def calibrate(repeat=15):
+    """Fastest microseconds of a fixed pure-Python loop, a measure of this machine's speed."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        total = 0
+        for i in range(200000):
+            total += i % 7
+        samples.append((time.perf_counter() - start) * 1e6)
+    return round(min(samples), 2)
+
+
+def time_benchmark(setup, run, num_players, repeat, seed):
+    samples = []
+    for i in range(repeat):
+        state = setup(num_players, seed + i)
+        gc.collect()
+        start = time.perf_counter()
+        run(state)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return {
+        "median_us": round(statistics.median(samples), 2),
+        "min_us": round(min(samples), 2),
+        "mean_us": round(statistics.fmean(samples), 2),
+        "repeat": repeat,
+    }
+
+
+def run_all(names, player_counts, repeat, seed):
+    results = {}
+    with contextlib.redirect_stdout(NullWriter()):
+        for name in names:
+            setup, run = BENCHMARKS[name]
+            for num_players in player_counts:
+                results[f"{name}@{num_players}"] = time_benchmark(
+                    setup, run, num_players, repeat, seed
+                )
+    return results
+
+
+def compare(results, baselines, threshold, speed=1.0):
+    """
+    Returns the keys whose median is more than threshold x the baseline median,
+    after scaling the baseline by speed (this machine's calibration / the baseline's).
+    """
+    regressions = []
+    for key, current in results.items():
+        base = baselines.get(key)
+        if not base:
+            print(f"  {key:<36} {current['median_us']:>10.1f} us  (no baseline)")
+            continue
+        ratio = current["median_us"] / max(base["median_us"] * speed, 1e-9)
+        flag = "REGRESSION" if ratio > threshold else "ok"
+        print(
+            f"  {key:<36} {current['median_us']:>10.1f} us  "
+            f"baseline {base['median_us']:>10.1f} us  x{ratio:5.2f}  {flag}"
+        )
+        if ratio > threshold:
+            regressions.append(key)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Engine hot path benchmarks")
+    parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS))
+    parser.add_argument("--players", default=",".join(map(str, PLAYER_COUNTS)))
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", action="store_true", help="Write results as the new baseline")
+    parser.add_argument("--compare", action="store_true", help="Compare against the baseline")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.5,
+        help="Allowed slowdown factor, relative to the calibrated baseline, before --compare fails",
+    )
+    parser.add_argument("--baseline-file", default=BASELINE_FILE)
+    args = parser.parse_args(argv)
+
+    names = args.only or list(BENCHMARKS)
+    player_counts = [int(n) for n in args.players.split(",") if n.strip()]
+    calibration_us = calibrate()
+    results = run_all(names, player_counts, args.repeat, args.seed)
+
+    if args.compare:
+        with open(args.baseline_file, encoding="utf-8") as f:
+            saved = json.load(f)
+        speed = calibration_us / saved["calibration_us"] if saved.get("calibration_us") else 1.0
+        print(f"Calibration {calibration_us:.0f} us, baselines scaled x{speed:.2f}")
+        regressions = compare(results, saved["results"], args.threshold, speed)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+        print("No regressions.")
+    else:
+        for key, r in results.items():
+            print(f"  {key:<36} median {r['median_us']:>10.1f} us  min {r['min_us']:>10.1f} us")
+
+    if args.save:
+        baseline = {
+            "python": sys.version.split()[0],
+            "calibration_us": calibration_us,
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "results": results,
+        }
+        with open(args.baseline_file, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline saved to {args.baseline_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,458 @@
+"""
+loadtest.py
+Version: 1.0.0
+Socket.IO load generator. Opens N simulated players per room against a running
+server and drives the real flow end to end: index POST, connect, start_game,
+hero_choice, accuse_player, cast_lynch_vote and vote_for_rematch.
+Per emit it records two latencies: "response", until the first packet the server
+sends back to that player, and "state", until the next game state update
+(game_state_sync, game_state_delta or lynch_vote_started). State latency for
+accusations and votes includes waiting for the rest of the room, so it is the
+phase transition time players see. Also samples the server process CPU.
+
+Requires: pip install "python-socketio[asyncio_client]"  (psutil optional)
+
+Every bot logs in from this machine, so run the server without the per-IP login limit.
+
+Usage:
+    DISABLE_RATE_LIMITS=true gunicorn --worker-class gevent -w 1 -b 127.0.0.1:5000 app:app &
+    python benchmarks/loadtest.py --url http://127.0.0.1:5000 --rooms 20 --players 12 \\
+        --games 2 --server-pid $!
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+import aiohttp
+import socketio
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+PHASE_NIGHT = "Night"
+PHASE_ACCUSATION = "Accusation"
+PHASE_LYNCH = "Lynch_Vote"
+PHASE_GAME_OVER = "Game_Over"
+
+
+# --- Measurements ---
+class LatencyRecorder:
+    def __init__(self):
+        self.samples = {"response": {}, "state": {}}  # kind -> Dict[event, List[seconds]]
+        self.unanswered = {}  # Dict[event, count] emits never followed by a state update
+        self.errors = {}  # Dict[message, count] from the server's "error" event
+
+    def add(self, kind, event, seconds):
+        self.samples[kind].setdefault(event, []).append(seconds)
+
+    def miss(self, event):
+        self.unanswered[event] = self.unanswered.get(event, 0) + 1
+
+    def error(self, message):
+        self.errors[message] = self.errors.get(message, 0) + 1
+
+    def summary(self):
+        result = {}
+        for kind, by_event in self.samples.items():
+            for event, values in sorted(by_event.items()):
+                values = sorted(values)
+                result.setdefault(event, {"unanswered": self.unanswered.get(event, 0)})
+                result[event][kind] = {
+                    "count": len(values),
+                    "p50_ms": round(percentile(values, 50) * 1000, 2),
+                    "p90_ms": round(percentile(values, 90) * 1000, 2),
+                    "p99_ms": round(percentile(values, 99) * 1000, 2),
+                    "max_ms": round(values[-1] * 1000, 2),
+                }
+        return result
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class CpuSampler:
+    """Samples the server process CPU once per interval (psutil, else /proc)."""
+
+    def __init__(self, pid, interval=1.0):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []  # percent of one core
+        self.process = psutil.Process(pid) if psutil else None
+        self.clock_ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def cpu_seconds(self):
+        if self.process:
+            times = self.process.cpu_times()
+            return times.user + times.system
+        with open(f"/proc/{self.pid}/stat", encoding="utf-8") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        # utime and stime are fields 14 and 15 of /proc/<pid>/stat
+        return (int(fields[11]) + int(fields[12])) / self.clock_ticks
+
+    async def run(self, stop_event):
+        last_cpu, last_wall = self.cpu_seconds(), time.perf_counter()
+        while not stop_event.is_set():
+            try:
+                await asyncio.wait_for(stop_event.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            cpu, wall = self.cpu_seconds(), time.perf_counter()
+            self.samples.append(100 * (cpu - last_cpu) / max(wall - last_wall, 1e-9))
+            last_cpu, last_wall = cpu, wall
+
+    def summary(self):
+        if not self.samples:
+            return {}
+        return {
+            "avg_percent": round(statistics.fmean(self.samples), 1),
+            "peak_percent": round(max(self.samples), 1),
+            "samples": len(self.samples),
+        }
+
+
+# --- Simulated Player ---
+class Bot:
+    def __init__(self, table, index, args, recorder):
+        self.table = table
+        self.index = index
+        self.name = f"{table.code}p{index}"
+        self.args = args
+        self.recorder = recorder
+        self.rng = random.Random(f"{args.seed}:{self.name}")
+        self.state = {}
+        self.version = None
+        self.acted = set()  # (phase, phase_end_time) already answered
+        self.pending = None  # [event, emit time, responded] awaiting a state update
+        self.http = None
+        self.sio = None
+
+    @property
+    def is_admin(self):
+        return self.index == 0
+
+    async def login(self):
+        # unsafe=True: aiohttp otherwise drops cookies set by IP-address hosts
+        self.http = aiohttp.ClientSession(cookie_jar=aiohttp.CookieJar(unsafe=True))
+        data = {"name": self.name, "game_code": self.table.code, "language": "en"}
+        async with self.http.post(f"{self.args.url}/", data=data, allow_redirects=False) as response:
+            if response.status != 302:
+                raise RuntimeError(
+                    f"{self.name}: login failed with HTTP {response.status}"
+                    " (is the server running with DISABLE_RATE_LIMITS=true?)"
+                )
+        # Same HTTP session, so the socket carries the login cookie
+        self.sio = socketio.AsyncClient(
+            reconnection=False, http_session=self.http, serializer=self.args.serializer
+        )
+        self.register_handlers()
+        await self.sio.connect(self.args.url, transports=["websocket"])
+
+    async def close(self):
+        if self.sio and self.sio.connected:
+            await self.sio.disconnect()
+        if self.http:
+            await self.http.close()
+
+    async def emit(self, event, data=None):
+        if self.pending:
+            self.recorder.miss(self.pending[0])
+        self.pending = [event, time.perf_counter(), False]
+        if data is None:
+            await self.sio.emit(event)
+        else:
+            await self.sio.emit(event, data)
+
+    # --- Incoming ---
+    def register_handlers(self):
+        self.sio.on("game_state_sync", self.on_game_state_sync)
+        self.sio.on("game_state_delta", self.on_game_state_delta)
+        self.sio.on("game_started", self.on_game_started)
+        self.sio.on("redirect_to_lobby", self.on_redirect_to_lobby)
+        self.sio.on("lynch_vote_started", self.on_lynch_vote_started)
+        self.sio.on("error", self.on_error)
+        self.sio.on("batch", self.on_batch)
+        self.sio.on("*", self.on_any)
+
+    def mark_response(self):
+        if self.pending and not self.pending[2]:
+            self.pending[2] = True
+            self.recorder.add("response", self.pending[0], time.perf_counter() - self.pending[1])
+
+    async def on_any(self, event, data=None):
+        self.mark_response()
+
+    async def on_batch(self, data):
+        """Coalesced frame from the server outbox, dispatched in emit order like the browser."""
+        for event, payload in data.get("events", []):
+            handler = self.sio.handlers["/"].get(event)
+            if handler is not None:
+                await handler(payload)
+            else:
+                await self.on_any(event, payload)
+
+    async def on_game_state_sync(self, data):
+        self.mark_response()
+        self.state = data
+        self.version = data.get("state_version")
+        await self.on_state()
+
+    async def on_game_state_delta(self, data):
+        self.mark_response()
+        if self.version is None or data.get("base_version") != self.version:
+            # Same recovery as the browser client: ask for a full state
+            self.version = None
+            return await self.sio.emit("client_ready_for_game")
+        self.state.update(data.get("changed", {}))
+        for key in data.get("removed", []):
+            self.state.pop(key, None)
+        self.version = data.get("state_version")
+        await self.on_state()
+
+    async def on_game_started(self, data=None):
+        self.mark_response()
+        await self.sio.emit("client_ready_for_game")
+
+    async def on_redirect_to_lobby(self, data=None):
+        self.mark_response()
+        if self.pending:
+            self.pending = None  # Rematch answered, the lobby has no game state
+        self.state = {}
+        self.version = None
+        if self.is_admin:
+            await self.table.next_game(self)
+
+    async def on_lynch_vote_started(self, data):
+        """The trial starts without a state broadcast, the client switches phase itself."""
+        self.mark_response()
+        self.state.update(
+            {
+                "phase": PHASE_LYNCH,
+                "phase_end_time": data.get("phase_end_time"),
+                "lynch_target_id": data.get("target_id"),
+                "my_lynch_vote": None,
+            }
+        )
+        await self.on_state(ack=False)
+
+    async def on_error(self, data=None):
+        self.mark_response()
+        message = data.get("message") if isinstance(data, dict) else str(data)
+        self.recorder.error(message)
+
+    async def on_state(self, ack=True):
+        if self.pending:
+            event, started, _ = self.pending
+            self.pending = None
+            self.recorder.add("state", event, time.perf_counter() - started)
+        if ack and self.version is not None:
+            await self.sio.emit("state_ack", {"version": self.version})
+        await self.act()
+
+    # --- Decisions (mirror the browser client) ---
+    async def act(self):
+        phase = self.state.get("phase")
+        key = (phase, self.state.get("phase_end_time"))
+        if key in self.acted:
+            return
+        if phase == PHASE_GAME_OVER:
+            self.acted.add(key)
+            self.table.game_over()
+            return await self.think_then_emit("vote_for_rematch")
+        if not self.state.get("is_alive"):
+            return
+
+        if phase == PHASE_NIGHT and self.state.get("night_ui"):
+            self.acted.add(key)
+            await self.think_then_emit("hero_choice", self.night_payload())
+        elif phase == PHASE_ACCUSATION and not self.state.get("my_phase_target_id"):
+            targets = [
+                p["id"]
+                for p in self.state.get("living_players", [])
+                if p["id"] != self.state.get("this_player_id")
+            ]
+            if targets:
+                self.acted.add(key)
+                await self.think_then_emit("accuse_player", {"target_id": self.rng.choice(targets)})
+        elif phase == PHASE_LYNCH and not self.state.get("my_lynch_vote"):
+            self.acted.add(key)
+            vote = "yes" if self.rng.random() < self.args.yes_chance else "no"
+            await self.think_then_emit("cast_lynch_vote", {"vote": vote})
+
+    def night_payload(self):
+        ui = self.state["night_ui"]
+        targets = [t["id"] for t in ui.get("targets", [])]
+        if not targets:
+            return {"target_id": "Nobody"}
+        target_id = self.rng.choice(targets)
+        payload = {"target_id": target_id}
+        header = ui.get("template", {}).get("header", "")
+        if ui.get("potions"):
+            payload["metadata"] = {"potion": self.rng.choice(ui["potions"])["id"]}
+        elif "Cupid" in header or "Backlash" in header:
+            others = [t for t in targets if t != target_id]
+            if others:
+                payload["metadata"] = {"target_id2": self.rng.choice(others)}
+        return payload
+
+    async def think_then_emit(self, event, data=None):
+        if self.args.think:
+            key = (self.state.get("phase"), self.state.get("phase_end_time"))
+            await asyncio.sleep(self.rng.uniform(0, self.args.think))
+            if key != (self.state.get("phase"), self.state.get("phase_end_time")):
+                return  # The phase moved on while this player was thinking
+        await self.emit(event, data)
+
+
+# --- Room Driver ---
+class Table:
+    def __init__(self, number, args, recorder):
+        self.number = number
+        self.code = f"L{args.tag}R{number}"
+        self.args = args
+        self.games_started = 0
+        self.games_finished = 0
+        self.finished_key = None
+        self.done = asyncio.Event()
+        self.bots = [Bot(self, i, args, recorder) for i in range(args.players)]
+
+    async def run(self):
+        for bot in self.bots:
+            await bot.login()  # sequential: the first bot becomes admin
+        await self.start_game(self.bots[0])
+        await self.done.wait()
+
+    async def start_game(self, admin):
+        self.games_started += 1
+        await admin.emit(
+            "start_game",
+            {"settings": {"mode": "standard"}, "roles": self.args.roles},
+        )
+
+    def game_over(self):
+        if self.finished_key != self.games_started:
+            self.finished_key = self.games_started
+            self.games_finished += 1
+
+    async def next_game(self, admin):
+        if self.games_started >= self.args.games:
+            self.done.set()
+        else:
+            await self.start_game(admin)
+
+    async def close(self):
+        for bot in self.bots:
+            await bot.close()
+
+
+async def run_load(args):
+    recorder = LatencyRecorder()
+    stop = asyncio.Event()
+    sampler = CpuSampler(args.server_pid) if args.server_pid else None
+    sampler_task = asyncio.create_task(sampler.run(stop)) if sampler else None
+
+    tables = [Table(n, args, recorder) for n in range(args.rooms)]
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(table.run()) for table in tables]
+    done, pending = await asyncio.wait(tasks, timeout=args.duration)
+    elapsed = time.perf_counter() - started
+    for task in pending:
+        task.cancel()
+    for task in done:
+        if task.exception():
+            print(f"Room failed: {task.exception()}", file=sys.stderr)
+            recorder.error(f"room failed: {task.exception()}")
+
+    stop.set()
+    if sampler_task:
+        await sampler_task
+    for table in tables:
+        for bot in table.bots:
+            if bot.pending:
+                recorder.miss(bot.pending[0])
+        await table.close()
+
+    return {
+        "rooms": args.rooms,
+        "players_per_room": args.players,
+        "games_finished": sum(t.games_finished for t in tables),
+        "rooms_timed_out": len(pending),
+        "elapsed_s": round(elapsed, 2),
+        "errors": recorder.errors,
+        "latency": recorder.summary(),
+        "server_cpu": sampler.summary() if sampler else None,
+    }
+
+
+def print_report(report):
+    print(
+        f"Rooms: {report['rooms']} x {report['players_per_room']} players | "
+        f"games finished: {report['games_finished']} | timed out rooms: "
+        f"{report['rooms_timed_out']} | {report['elapsed_s']}s"
+    )
+    for event, kinds in report["latency"].items():
+        for kind in ("response", "state"):
+            s = kinds.get(kind)
+            if not s:
+                continue
+            print(
+                f"  {event:<18} {kind:<8} n={s['count']:<6} p50 {s['p50_ms']:>8.1f} ms  "
+                f"p90 {s['p90_ms']:>8.1f} ms  p99 {s['p99_ms']:>8.1f} ms  max {s['max_ms']:>8.1f} ms"
+            )
+        if kinds["unanswered"]:
+            print(f"  {event:<18} unanswered {kinds['unanswered']}")
+    for message, count in report["errors"].items():
+        print(f"  error x{count}: {message}")
+    if report["server_cpu"]:
+        cpu = report["server_cpu"]
+        print(f"  server cpu: avg {cpu['avg_percent']}%  peak {cpu['peak_percent']}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Socket.IO load test")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--rooms", type=int, default=5)
+    parser.add_argument("--players", type=int, default=8, help="Players per room (max 32)")
+    parser.add_argument("--games", type=int, default=1, help="Games per room (rematch between)")
+    parser.add_argument("--roles", default="Seer,Witch,Cupid,Hunter", help="Comma separated role keys")
+    parser.add_argument("--think", type=float, default=0.5, help="Max random delay before each action (s)")
+    parser.add_argument("--yes-chance", type=float, default=0.6)
+    parser.add_argument("--duration", type=float, default=600, help="Give up after this many seconds")
+    parser.add_argument("--server-pid", type=int, help="Server process to sample CPU from")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--serializer",
+        choices=["default", "msgpack"],
+        default="default",
+        help="Must match the server's SOCKETIO_SERIALIZER",
+    )
+    parser.add_argument(
+        "--tag",
+        default=str(int(time.time()) % 1000000),
+        help="Goes into every room code so repeated runs never collide",
+    )
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+    args.url = args.url.rstrip("/")
+    args.roles = ["Villager", "Werewolf"] + [r.strip() for r in args.roles.split(",") if r.strip()]
+
+    report = asyncio.run(run_load(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 1 if report["errors"] or report["rooms_timed_out"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,8 +10,17 @@ GAME_DEFAULTS = {
     "DEFAULT_LANGUAGE": "en",
     "DEFAULT_ROLES": ["Villager", "Werewolf"],
     "ENABLE_PASS_AND_PLAY": False,
+    "MAX_ROOMS": 500,
+    "MESSAGE_HISTORY_SIZE": 200,
     "MIN_PLAYERS": 4,
     "PAUSE_DURATION": 3,
+    # Token buckets per route/event: rate = requests per second, burst = back to back
+    "RATE_LIMITS": {
+        "join": {"rate": 0.5, "burst": 3},  # per client IP
+        "send_message": {"rate": 2, "burst": 3},  # per socket
+    },
+    "RATE_LIMIT_MAX_KEYS": 10000,  # per limit, least recently seen are dropped first
+    "ROOM_IDLE_TIMEOUT": 3600,
     "TIME_NIGHT": 90,
     "TIME_ACCUSATION": 90,
     "TIME_LYNCH": 30,
@@ -6,7 +6,23 @@ Manages the game flow, player states, complex role interactions, and phase trans
 import random
 import time
 from config import GAME_DEFAULTS
-from collections import Counter
+from collections import Counter, deque
+from functools import wraps
+from itertools import islice
+from journal import (
+    OP_ACCUSATION,
+    OP_ADVANCE_PHASE,
+    OP_CHECK_GAME_OVER,
+    OP_LYNCH_VOTE,
+    OP_NIGHT_ACTION,
+    OP_REMOVE_PLAYER,
+    OP_RESOLVE_LYNCH,
+    OP_RESOLVE_NIGHT,
+    OP_SET_PHASE,
+    OP_START,
+    OP_TALLY_ACCUSATIONS,
+    RecordingRandom,
+)
 from roles import *
 from threading import RLock
 
@@ -18,6 +34,31 @@ PHASE_LYNCH = "Lynch_Vote"
 PHASE_GAME_OVER = "Game_Over"
 
 
+def journaled(opcode):
+    """
+    Runs the call under the game lock and appends it to the game's journal.
+    Calls made from inside another journaled call are not recorded.
+    """
+
+    def decorate(method):
+        @wraps(method)
+        def recorded(self, *args):
+            with self.lock:
+                if self.journal is None:
+                    return method(self, *args)
+                if not self.journal_depth:
+                    self.journal.append(opcode, list(args))
+                self.journal_depth += 1
+                try:
+                    return method(self, *args)
+                finally:
+                    self.journal_depth -= 1
+
+        return recorded
+
+    return decorate
+
+
 class Player:
     def __init__(self, session_id, name):
         self.id = session_id
@@ -27,6 +68,7 @@ class Player:
         self.status_effects = []  # e.g., ['protected', 'poisoned']
         self.linked_partner_id = None  # For Cupid's lovers
         self.visiting_id = None  # for prostitue
+        self.action_serial = 0  # bumped on each night action or vote this player submits
 
     def reset_night_status(self):
         PERSISTENT_EFFECTS = ["poisoned", "immune_to_wolf", "2nd_life", "solo_win"]
@@ -45,28 +87,99 @@ class Player:
             "status_effects": self.status_effects,
         }
 
+    def to_snapshot(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "role": self.role.to_snapshot() if self.role else None,
+            "is_alive": self.is_alive,
+            "status_effects": self.status_effects,
+            "linked_partner_id": self.linked_partner_id,
+            "visiting_id": self.visiting_id,
+            "action_serial": self.action_serial,
+        }
+
+    @classmethod
+    def from_snapshot(cls, data):
+        player = cls(data["id"], data["name"])
+        player.role = role_from_snapshot(data["role"]) if data["role"] else None
+        player.is_alive = data["is_alive"]
+        player.status_effects = data["status_effects"]
+        player.linked_partner_id = data["linked_partner_id"]
+        player.visiting_id = data["visiting_id"]
+        player.action_serial = data["action_serial"]
+        return player
+
+
+class MessageHistory:
+    """
+    Fixed-capacity ring buffer of public game messages.
+    Each entry gets a monotonically increasing sequence number so clients can
+    fetch only the entries after the last one they have seen.
+    """
+
+    def __init__(self, capacity=None):
+        self.entries = deque(maxlen=capacity or GAME_DEFAULTS["MESSAGE_HISTORY_SIZE"])
+        self.last_seq = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return (message for _, message in self.entries)
+
+    def append(self, message):
+        self.last_seq += 1
+        self.entries.append((self.last_seq, message))
+
+    def since(self, seq):
+        """Returns [{seq, message}] for every buffered entry newer than seq."""
+        if seq >= self.last_seq or not self.entries:
+            return []
+        first_seq = self.entries[0][0]
+        start = max(0, seq - first_seq + 1)
+        return [
+            {"seq": s, "message": message}
+            for s, message in islice(self.entries, start, None)
+        ]
+
 
 class Game:
-    def __init__(self, game_id, settings=None, mode="standard"):
+    def __init__(self, game_id, settings=None, mode="standard", seed=None, lock=None):
         self.game_id = game_id
         self.settings = settings or {}
         self.mode = self.settings.get("mode", mode)
         self.isPassAndPlay = self.mode == "pass_and_play"
         self.ghost_mode = self.settings.get("ghost_mode", False)
         self.pg_mode = self.settings.get("pg_mode", False)
-        self.lock = RLock()
-        self.message_history = []
+        # Rooms pass their own lock, so engine calls and app.py handlers share one per table
+        self.lock = lock or RLock()
+        self.message_history = MessageHistory()
+        self.version = 0  # bumped on every mutation, keys app.py's public state cache
+        self.roster_version = 0  # bumped when players join, leave or die
+        # Every draw that decides the game goes through here, roles get it as game_context["rng"]
+        # Same seed, same inputs -> same game, whatever else runs in the process.
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.journal = None  # Journal, see start_journal()
+        self.journal_depth = 0
 
         self.phase = PHASE_LOBBY
         self.phase_start_time = None
         self.phase_end_time = 0
 
         self.prompt_order = list(range(Role.VILLAGER_PROMPT_COUNT))
-        random.shuffle(self.prompt_order)
+        self.rng.shuffle(self.prompt_order)
         self.night_count = -1
 
         self.players = {}  # Dict[session_id, Player_Obj]
 
+        # Living Indexes, kept in sync on death and team change
+        self.living = {}  # Dict[player_id, Player_Obj]
+        self.living_by_team = {}  # Dict[team, Dict[player_id, Player_Obj]]
+        self.living_by_role = {}  # Dict[role name_key, Dict[player_id, Player_Obj]]
+        self._indexed_as = {}  # Dict[player_id, (team, name_key)]
+
         # Night Phase Data
         self.pending_actions = {}  # Dict[player_id, target_id]
         self.turn_history = set()  # set[player_id]
@@ -94,6 +207,8 @@ class Game:
             ),
         }
         self.current_timer_id = 0  # increment id to invalidate old async timers
+        self.on_phase_timer = None  # callback(game) whenever a new phase deadline is set
+        self.on_player_status = None  # callback(game, player) after a death or team change
 
         # End Game Data
         self.winner = None
@@ -101,13 +216,113 @@ class Game:
         self.rematch_votes = set()
 
     # --- Game Management ---
+    def bump_version(self):
+        """Call after changing game state from outside the engine (votes, admin toggles)."""
+        self.version += 1
+
+    def bump_roster(self):
+        self.roster_version += 1
+        self.bump_version()
+
     def add_player(self, session_id, name):
         if session_id not in self.players:
             self.players[session_id] = Player(session_id, name)
+            self._index_player(self.players[session_id])
+            self.bump_roster()
 
+    @journaled(OP_REMOVE_PLAYER)
     def remove_player(self, session_id):
         if session_id in self.players:
+            self._unindex_player(session_id)
             del self.players[session_id]
+            self.bump_roster()
+
+    def clear_players(self):
+        self.players = {}
+        self.rebuild_indexes()
+        self.bump_roster()
+
+    def start_journal(self, journal, opcode=OP_START):
+        """Records the game from here on: a full snapshot, then inputs and random draws."""
+        with self.lock:
+            self.close_journal()
+            journal.append(opcode, self.to_snapshot())
+            self.journal = journal
+            self.rng = self.continue_rng(RecordingRandom(journal))
+
+    def close_journal(self):
+        if self.journal:
+            self.journal.close()
+            self.journal = None
+            self.rng = self.continue_rng(random.Random())
+
+    def continue_rng(self, rng):
+        """rng picks up the current random sequence, so swapping it keeps a seeded game reproducible."""
+        rng.setstate(self.rng.getstate())
+        return rng
+
+    # --- Living Indexes ---
+    def rebuild_indexes(self):
+        self.living = {}
+        self.living_by_team = {}
+        self.living_by_role = {}
+        self._indexed_as = {}
+        for player in self.players.values():
+            if player.is_alive:
+                self._index_player(player)
+
+    def _index_player(self, player):
+        team = player.role.team if player.role else None
+        name_key = player.role.name_key if player.role else None
+        self.living[player.id] = player
+        self.living_by_team.setdefault(team, {})[player.id] = player
+        self.living_by_role.setdefault(name_key, {})[player.id] = player
+        self._indexed_as[player.id] = (team, name_key)
+
+    def _unindex_player(self, player_id):
+        self.living.pop(player_id, None)
+        indexed = self._indexed_as.pop(player_id, None)
+        if indexed:
+            team, name_key = indexed
+            self.living_by_team.get(team, {}).pop(player_id, None)
+            self.living_by_role.get(name_key, {}).pop(player_id, None)
+
+    def kill_player(self, player):
+        player.is_alive = False
+        self._unindex_player(player.id)
+        self.bump_roster()
+        self.notify_player_status(player)
+
+    def notify_player_status(self, player):
+        if self.on_player_status:
+            self.on_player_status(self, player)
+
+    def build_context(self, **extra):
+        """
+        game_context for role hooks: the roster, id and living indexes, and the rng.
+        The indexes are live, copy them before killing while iterating.
+        """
+        game_context = {
+            "players": list(self.players.values()),
+            "players_by_id": self.players,
+            "living": self.living,
+            "living_by_team": self.living_by_team,
+            "living_by_role": self.living_by_role,
+            "rng": self.rng,
+        }
+        game_context.update(extra)
+        return game_context
+
+    def reindex_player(self, player):
+        """Call after a role hook may have changed a living player's team (Wild Child)."""
+        if not player.is_alive:
+            return
+        team = player.role.team if player.role else None
+        name_key = player.role.name_key if player.role else None
+        if self._indexed_as.get(player.id) != (team, name_key):
+            self._unindex_player(player.id)
+            self._index_player(player)
+            self.notify_player_status(player)
 
     def assign_roles(self, selected_role_keys):
         """
@@ -126,7 +341,7 @@ class Game:
 
         # 2. Prepare Players
         player_ids = list(self.players.keys())
-        random.shuffle(player_ids)
+        self.rng.shuffle(player_ids)
         num_players = len(player_ids)
 
         # 3. Calculate Counts (The Math)
@@ -166,7 +381,7 @@ class Game:
             final_roles_list = final_roles_list[:num_players]
 
         # 2nd Shuffle of roles to ensure randomnes
-        random.shuffle(final_roles_list)
+        self.rng.shuffle(final_roles_list)
 
         print(f"Final List of Role Keys to Assign: {final_roles_list}")
 
@@ -181,28 +396,39 @@ class Game:
             # Instantiate and Assign
             player_obj = self.players[player_id]
             player_obj.role = role_class()
-            player_obj.role.on_assign(player_obj)
+            player_obj.role.on_assign(player_obj, {"rng": self.rng})
 
             print(f"Assigned {role_class.__name__} to {player_obj.name}")
 
+        self.rebuild_indexes()
+        self.bump_roster()
         print(f"Roles assigned for Game {self.game_id} (Mode: {self.mode})")
 
     def is_ghost_mode_active(self):
         """Active only if setting enabled AND 2 or more players are dead."""
-        dead_count = len(self.players) - len(self.get_living_players())
+        dead_count = len(self.players) - len(self.living)
         return self.ghost_mode and dead_count >= 2
 
     def get_living_players(self, role_team=None):
-        living_players = [p for p in self.players.values() if p.is_alive]
         if role_team:
-            return [p for p in living_players if p.role.team == role_team]
-        return living_players
+            return list(self.living_by_team.get(role_team, {}).values())
+        return list(self.living.values())
+
+    def get_living_by_role(self, name_key):
+        return list(self.living_by_role.get(name_key, {}).values())
+
+    def count_living(self, role_team=None):
+        if role_team:
+            return len(self.living_by_team.get(role_team, {}))
+        return len(self.living)
 
     def has_player_voted_to_sleep(self, player_id):
         """Returns True if the player is in the set of sleep voters."""
         return player_id in self.end_day_votes
 
+    @journaled(OP_SET_PHASE)
     def set_phase(self, new_phase):
+        self.bump_version()
         self.phase = new_phase
         self.phase_start_time = time.time()
         self.current_timer_id += 1
@@ -217,13 +443,13 @@ class Game:
             self.night_count += 1
             self.pending_actions = {}
             self.turn_history = set()  # Reset tracker
+            game_context = self.build_context()
             for player_obj in self.players.values():
                 player_obj.reset_night_status()
                 # trigger night hoooks
                 if player_obj.role:
-                    player_obj.role.on_night_start(
-                        player_obj, {"players": list(self.players.values())}
-                    )
+                    player_obj.role.on_night_start(player_obj, game_context)
+                    self.reindex_player(player_obj)
         elif new_phase == PHASE_ACCUSATION:
             for player_obj in self.players.values():
                 player_obj.visiting_id = None
@@ -235,6 +461,8 @@ class Game:
             self.pending_actions = {}
 
         self.phase_end_time = time.time() + duration
+        if self.on_phase_timer and new_phase in self.timer_durations:
+            self.on_phase_timer(self)
 
     def tick(self):
         """
@@ -247,10 +475,27 @@ class Game:
             if self.phase_end_time and time.time() >= self.phase_end_time:
                 # Prevent double firing
                 self.phase_end_time = 0
+                self.bump_version()
                 return "TIMEOUT"
 
             return None
 
+    def expire_timer(self, timer_id):
+        """
+        Called by the scheduler when a phase deadline passes.
+        Returns 'TIMEOUT' once for the current phase, None for stale or paused timers.
+        """
+        with self.lock:
+            if timer_id != self.current_timer_id or self.timers_disabled:
+                return None
+            if not self.phase_end_time:
+                return None
+            # Prevent double firing
+            self.phase_end_time = 0
+            self.bump_version()
+            return "TIMEOUT"
+
+    @journaled(OP_ADVANCE_PHASE)
     def advance_phase(self):
         """
         Automatically transitions to the next logical phase based on current state.
@@ -276,6 +521,7 @@ class Game:
 
         return raw_index
 
+    @journaled(OP_NIGHT_ACTION)
     def receive_night_action(self, player_id, target_id):
         """
         Store the player's intent. Process it later.
@@ -290,6 +536,8 @@ class Game:
 
             self.pending_actions[player_id] = target_id
             self.turn_history.add(player_id)
+            self.players[player_id].action_serial += 1
+            self.bump_version()
             print(f"Action received from {self.players[player_id].name}")
 
             # Calculate who NEEDS to act (Alive + is_night_active)
@@ -304,7 +552,7 @@ class Game:
 
             # 1. Check if we should resolve (Pass-and-Play Logic) All players active
             if self.isPassAndPlay:
-                living_count = len(self.get_living_players())
+                living_count = self.count_living()
                 acted_count = len(self.turn_history)
                 print(f"PassAndPlay Status: {acted_count}/{living_count} have acted.")
                 if acted_count >= living_count:
@@ -371,7 +619,7 @@ class Game:
                 continue  # Stop processing this death
 
             # 2. Mark Dead
-            player.is_alive = False
+            self.kill_player(player)
             processed_ids.add(pid)
 
             # Record Death Event
@@ -387,17 +635,16 @@ class Game:
 
             # 3. Wild Child Check
             # Check if any ALIVE Wild Child was linked to this DEAD player
-            for p in self.players.values():
-                if p.is_alive and p.role and p.role.name_key == ROLE_WILD_CHILD:
-                    if getattr(p.role, "role_model_id", None) == pid:
-                        if not p.role.transformed:
-                            # Re-trigger night start to handle transformation logic
-                            # (Sets transformed=True, team=Werewolves)
-                            game_context = {"players": list(self.players.values())}
-                            p.role.on_night_start(p, game_context)
+            for p in self.get_living_by_role(ROLE_WILD_CHILD):
+                if getattr(p.role, "role_model_id", None) == pid:
+                    if not p.role.transformed:
+                        # Re-trigger night start to handle transformation logic
+                        # (Sets transformed=True, team=Werewolves)
+                        p.role.on_night_start(p, self.build_context())
+                        self.reindex_player(p)
 
             # 4. Role 'on_death' Hooks (Hunter, Honeypot, etc.)
-            ctx = {"players": list(self.players.values()), "reason": reason}
+            ctx = self.build_context(reason=reason)
             if context == "lynch":
                 ctx["lynch_votes"] = self.pending_actions
 
@@ -454,10 +701,11 @@ class Game:
 
         return events
 
+    @journaled(OP_RESOLVE_NIGHT)
     def resolve_night_deaths(self):
         print("--- RESOLVING NIGHT Deaths & ACTIONS ---")
 
-        active_player_objs = [p for p in self.players.values() if p.is_alive]
+        active_player_objs = self.get_living_players()
         active_player_objs.sort(key=lambda p: p.role.priority)
 
         werewolf_vote_ids = []
@@ -466,10 +714,7 @@ class Game:
 
         # Accumulate all outcomes here
         final_events = []
-        game_context = {
-            "players": list(self.players.values()),
-            "pending_actions": self.pending_actions,
-        }
+        game_context = self.build_context(pending_actions=self.pending_actions)
 
         # Helper to merge cascade results into final_events list
         def merge_cascade_results(cascade_dict):
@@ -657,6 +902,7 @@ class Game:
 
     # --- DAY LOGIC (Accusations & Voting) ---
 
+    @journaled(OP_ACCUSATION)
     def process_accusation(self, accuser_id, target_id):
         """Returns True if this accusation triggered a majority/all-voted condition (optional optimization)."""
         with self.lock:
@@ -674,22 +920,26 @@ class Game:
                     return False  # Dead cannot vote if ghost mode inactive
 
                 # 25% Chance check
-                if random.random() > 0.25:
+                if self.rng.random() > 0.25:
                     vote_value = "Ghost_Fail"
 
             # Record the vote (if not already voted)
             if accuser_id not in self.pending_actions:
                 self.pending_actions[accuser_id] = vote_value
+                player.action_serial += 1
+                self.bump_version()
 
             # CHECK: Have all LIVING players voted?
             living_voters = [
                 pid for pid in self.pending_actions.keys() if self.players[pid].is_alive
             ]
-            living_total = len(self.get_living_players())
+            living_total = self.count_living()
 
             return len(living_voters) >= living_total
 
+    @journaled(OP_TALLY_ACCUSATIONS)
     def tally_accusations(self):
+        self.bump_version()
         valid_votes = [
             target_id
             for target_id in self.pending_actions.values()
@@ -764,6 +1014,7 @@ class Game:
             "target_name": self.players[self.lynch_target_id].name,
         }
 
+    @journaled(OP_LYNCH_VOTE)
     def cast_lynch_vote(self, voter_id, vote):
         """Returns True if all players have voted."""
         with self.lock:
@@ -786,27 +1037,30 @@ class Game:
                 if not self.is_ghost_mode_active():
                     return False
                 # 10% Chance check
-                if random.random() > 0.10:
+                if self.rng.random() > 0.10:
                     vote_value = "Ghost_Fail"  # Failed roll
 
             # Record vote
             self.pending_actions[voter_id] = vote_value  # FIX: Use vote_value
+            player.action_serial += 1
+            self.bump_version()
 
             # CHECK: Have all LIVING players voted?
             living_voters = [
                 pid for pid in self.pending_actions.keys() if self.players[pid].is_alive
             ]
-            living_total = len(self.get_living_players())
+            living_total = self.count_living()
 
             return len(living_voters) >= living_total
 
+    @journaled(OP_RESOLVE_LYNCH)
     def resolve_lynch_vote(self):
         """
         Calculates lynch result. Apply death if needed. Checks Win.
         Returns result dict.
         """
         yes_count = list(self.pending_actions.values()).count("yes")
-        living_total = len(self.get_living_players())
+        living_total = self.count_living()
 
         result_data = {
             "summary": {"yes": [], "no": []},
@@ -879,6 +1133,7 @@ class Game:
                         killed_obj.status_effects.append("solo_win")
 
                     if not solo_win_continues:
+                        self.bump_version()
                         self.winner = killed_obj.name
                         self.game_over_data = {
                             "winning_team": killed_obj.name,
@@ -898,6 +1153,7 @@ class Game:
 
         return result_data
 
+    @journaled(OP_CHECK_GAME_OVER)
     def check_game_over(self):
         """
         Checks all win conditions.
@@ -909,7 +1165,7 @@ class Game:
             return True
 
         active_player_objs = self.get_living_players()
-        game_context = {"players": list(self.players.values())}
+        game_context = self.build_context()
 
         self.winner = None
         reason = ""
@@ -949,22 +1205,23 @@ class Game:
 
         # 2. Check Team Win Conditions
         if not self.winner:
-            wolves = self.get_living_players("Werewolves")
-            non_wolves_count = len(active_player_objs) - len(wolves)
+            wolves_count = self.count_living("Werewolves")
+            non_wolves_count = len(active_player_objs) - wolves_count
 
             # Villagers win if no wolves left
-            if len(wolves) == 0:
+            if wolves_count == 0:
                 self.winner = "Villagers"
                 # reason = "All of the <span style='color: #880808'>Werewolves</span> have been eradicated."
                 reason = {"key": "events.win_villagers", "variables": {}}
 
             # Wolves win if they outnumber villagers (or equal)
-            elif len(wolves) >= non_wolves_count:
+            elif wolves_count >= non_wolves_count:
                 self.winner = "Werewolves"
                 # reason = "The <span style='color: #880808'>Werewolves</span> have taken over the village."
                 reason = {"key": "events.win_werewolves", "variables": {}}
 
         if self.winner:
+            self.bump_version()
             self.phase = PHASE_GAME_OVER
 
             # CRITICAL: You must populate this data or the frontend will ignore the screen!
@@ -984,3 +1241,68 @@ class Game:
             "players": [p.to_dict() for p in self.players.values()],
             "winner": self.winner,
         }
+
+    # --- Snapshots ---
+    def to_snapshot(self):
+        """Everything needed to continue this game after a restart, JSON types only."""
+        with self.lock:
+            return {
+                "game_id": self.game_id,
+                "seed": self.seed,
+                "settings": self.settings,
+                "mode": self.mode,
+                "ghost_mode": self.ghost_mode,
+                "pg_mode": self.pg_mode,
+                "phase": self.phase,
+                "phase_start_time": self.phase_start_time,
+                "phase_end_time": self.phase_end_time,
+                "current_timer_id": self.current_timer_id,
+                "prompt_order": self.prompt_order,
+                "night_count": self.night_count,
+                "players": [p.to_snapshot() for p in self.players.values()],
+                "pending_actions": self.pending_actions,
+                "turn_history": sorted(self.turn_history),
+                "accusation_restarts": self.accusation_restarts,
+                "end_day_votes": sorted(self.end_day_votes),
+                "lynch_target_id": self.lynch_target_id,
+                "admin_only_chat": self.admin_only_chat,
+                "timers_disabled": self.timers_disabled,
+                "timer_durations": self.timer_durations,
+                "winner": self.winner,
+                "game_over_data": self.game_over_data,
+                "rematch_votes": sorted(self.rematch_votes),
+                "history": list(self.message_history.entries),
+                "history_seq": self.message_history.last_seq,
+                "journal_path": self.journal.path if self.journal else None,
+            }
+
+    @classmethod
+    def from_snapshot(cls, data, lock=None):
+        game = cls(data["game_id"], settings=data["settings"], seed=data.get("seed"), lock=lock)
+        game.mode = data["mode"]
+        game.isPassAndPlay = game.mode == "pass_and_play"
+        game.ghost_mode = data["ghost_mode"]
+        game.pg_mode = data["pg_mode"]
+        game.phase = data["phase"]
+        game.phase_start_time = data["phase_start_time"]
+        game.phase_end_time = data["phase_end_time"]
+        game.current_timer_id = data["current_timer_id"]
+        game.prompt_order = data["prompt_order"]
+        game.night_count = data["night_count"]
+        game.players = {p["id"]: Player.from_snapshot(p) for p in data["players"]}
+        game.pending_actions = data["pending_actions"]
+        game.turn_history = set(data["turn_history"])
+        game.accusation_restarts = data["accusation_restarts"]
+        game.end_day_votes = set(data["end_day_votes"])
+        game.lynch_target_id = data["lynch_target_id"]
+        game.admin_only_chat = data["admin_only_chat"]
+        game.timers_disabled = data["timers_disabled"]
+        game.timer_durations = data["timer_durations"]
+        game.winner = data["winner"]
+        game.game_over_data = data["game_over_data"]
+        game.rematch_votes = set(data["rematch_votes"])
+        game.message_history.entries.extend(tuple(entry) for entry in data["history"])
+        game.message_history.last_seq = data["history_seq"]
+        game.rebuild_indexes()
+        game.bump_roster()
+        return game
@@ -0,0 +1,140 @@
+"""
+journal.py
+Version: 1.0.0
+Append-only event journal for one game. Every record is an opcode byte, a
+uint32 payload length (little endian) and the payload as compact JSON.
+The journal starts with a full Game snapshot, then holds the inputs that move
+the game (night actions, accusations, lynch votes, phase changes, resolutions)
+and every random draw, so replay.py can rebuild any state offline.
+"""
+import json
+import random
+import struct
+import threading
+
+HEADER = struct.Struct("<BI")
+MAGIC = b"WWJ1"
+
+# --- Opcodes ---
+OP_START = 1  # Game.to_snapshot() when the journal opens
+OP_RESTORE = 2  # Game.to_snapshot() after a restart, replay resets to it
+OP_RNG = 3  # one random() or getrandbits() result
+OP_SET_PHASE = 10
+OP_NIGHT_ACTION = 11
+OP_ACCUSATION = 12
+OP_LYNCH_VOTE = 13
+OP_RESOLVE_NIGHT = 14
+OP_TALLY_ACCUSATIONS = 15
+OP_RESOLVE_LYNCH = 16
+OP_CHECK_GAME_OVER = 17
+OP_ADVANCE_PHASE = 18
+OP_REMOVE_PLAYER = 19
+
+# Opcode -> Game method, the arguments are the payload list
+CALL_OPCODES = {
+    OP_SET_PHASE: "set_phase",
+    OP_NIGHT_ACTION: "receive_night_action",
+    OP_ACCUSATION: "process_accusation",
+    OP_LYNCH_VOTE: "cast_lynch_vote",
+    OP_RESOLVE_NIGHT: "resolve_night_deaths",
+    OP_TALLY_ACCUSATIONS: "tally_accusations",
+    OP_RESOLVE_LYNCH: "resolve_lynch_vote",
+    OP_CHECK_GAME_OVER: "check_game_over",
+    OP_ADVANCE_PHASE: "advance_phase",
+    OP_REMOVE_PLAYER: "remove_player",
+}
+OPCODE_NAMES = {
+    OP_START: "start",
+    OP_RESTORE: "restore",
+    OP_RNG: "rng",
+    **CALL_OPCODES,
+}
+
+
+class Journal:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+            self.file.flush()
+
+    def append(self, opcode, payload):
+        data = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        with self.lock:
+            if self.file.closed:
+                return
+            self.file.write(HEADER.pack(opcode, len(data)) + data)
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def read_journal(path):
+    """Returns [(opcode, payload)]. A torn last record (crash mid-write) is dropped."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[: len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a game journal")
+    records = []
+    offset = len(MAGIC)
+    while offset + HEADER.size <= len(data):
+        opcode, length = HEADER.unpack_from(data, offset)
+        start = offset + HEADER.size
+        if start + length > len(data):
+            break
+        records.append((opcode, json.loads(data[start : start + length])))
+        offset = start + length
+    return records
+
+
+# --- Random Draws ---
+# random.Random derives choice(), shuffle(), sample() etc. from random() and
+# getrandbits(), so recording those two reproduces every draw.
+class RecordingRandom(random.Random):
+    def __init__(self, journal):
+        super().__init__()
+        self.journal = journal
+
+    def random(self):
+        value = super().random()
+        self.journal.append(OP_RNG, value)
+        return value
+
+    def getrandbits(self, k):
+        value = super().getrandbits(k)
+        self.journal.append(OP_RNG, value)
+        return value
+
+
+class ReplayRandom(random.Random):
+    """Hands out the OP_RNG results that follow the current record."""
+
+    def __init__(self, cursor):
+        super().__init__()
+        self.cursor = cursor  # ReplayCursor
+
+    def random(self):
+        return self.cursor.next_draw()
+
+    def getrandbits(self, k):
+        return self.cursor.next_draw()
+
+
+class ReplayCursor:
+    def __init__(self, records):
+        self.records = records
+        self.index = 0
+
+    def next_record(self):
+        record = self.records[self.index]
+        self.index += 1
+        return record
+
+    def next_draw(self):
+        if self.index >= len(self.records) or self.records[self.index][0] != OP_RNG:
+            raise ValueError(f"Replay diverged: no random draw recorded at record {self.index}")
+        return self.next_record()[1]
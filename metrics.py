@@ -0,0 +1,216 @@
+"""
+metrics.py
+Version: 1.0.0
+In-process instrumentation for the server: latency histograms and error counts for
+every Socket.IO handler and HTTP route, bytes/messages emitted per event, and named
+section timers. Rendered in Prometheus text format for the /metrics route.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from engineio import packet as eio_packet
+from flask import g, request
+
+# Seconds. Phase pauses run on the timer queue, so the top buckets mean a handler really stalled.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# python-socketio retries these with one argument less on TypeError (optional auth/reason)
+ARITY_RETRY_EVENTS = ("connect", "disconnect")
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    def __init__(self, prefix="werewolves"):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.local = threading.local()  # greenlet-local under gevent
+        self.started_at = time.time()
+
+        self.handler_seconds = {}  # Dict[event, Histogram]
+        self.handler_errors = {}  # Dict[event, count]
+        self.http_seconds = {}  # Dict[(endpoint, method), Histogram]
+        self.http_responses = {}  # Dict[(endpoint, method, status), count]
+        self.http_errors = {}  # Dict[(endpoint, method), count]
+        self.section_seconds = {}  # Dict[section, Histogram]
+        self.emitted_bytes = {}  # Dict[event, bytes]
+        self.emitted_messages = {}  # Dict[event, frames]
+
+    # --- Recording ---
+    def observe(self, table, key, seconds):
+        with self.lock:
+            histogram = table.get(key)
+            if histogram is None:
+                histogram = table[key] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, table, key, amount=1):
+        with self.lock:
+            table[key] = table.get(key, 0) + amount
+
+    @contextmanager
+    def timer(self, section):
+        """Times a named section, e.g. with metrics.timer("resolve_lynch_vote"): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(self.section_seconds, section, time.perf_counter() - start)
+
+    # --- Socket.IO ---
+    def wrap_handler(self, event, handler):
+        def timed_handler(*args):
+            start = time.perf_counter()
+            try:
+                result = handler(*args)
+            except TypeError:
+                if event not in ARITY_RETRY_EVENTS:
+                    self.increment(self.handler_errors, event)
+                    self.observe(self.handler_seconds, event, time.perf_counter() - start)
+                raise  # connect/disconnect: the retried call gets recorded
+            except Exception:
+                self.increment(self.handler_errors, event)
+                self.observe(self.handler_seconds, event, time.perf_counter() - start)
+                raise
+            self.observe(self.handler_seconds, event, time.perf_counter() - start)
+            return result
+
+        timed_handler.metrics_event = event
+        return timed_handler
+
+    def instrument_socketio(self, socketio):
+        """
+        Wraps every registered handler (call once, after all @socketio.on) and
+        counts outgoing frames. Bytes are taken from the already encoded Engine.IO
+        packets, so nothing is serialized twice.
+        """
+        server = socketio.server
+        for handlers in server.handlers.values():
+            for event, handler in list(handlers.items()):
+                if not hasattr(handler, "metrics_event"):
+                    handlers[event] = self.wrap_handler(event, handler)
+
+        original_emit = server.emit
+
+        def counted_emit(event, *args, **kwargs):
+            previous = getattr(self.local, "event", None)
+            self.local.event = event
+            try:
+                return original_emit(event, *args, **kwargs)
+            finally:
+                self.local.event = previous
+
+        server.emit = counted_emit
+
+        eio = server.eio
+        original_send_packet = eio.send_packet
+
+        def counted_send_packet(sid, pkt):
+            if pkt.packet_type == eio_packet.MESSAGE and pkt.data is not None:
+                event = getattr(self.local, "event", None) or "other"
+                self.increment(self.emitted_messages, event)
+                self.increment(self.emitted_bytes, event, len(pkt.data))
+            return original_send_packet(sid, pkt)
+
+        eio.send_packet = counted_send_packet
+
+    # --- HTTP ---
+    def instrument_flask(self, app):
+        @app.before_request
+        def start_request_timer():
+            g.metrics_start = time.perf_counter()
+            g.metrics_http = True  # Socket.IO events also push request contexts
+
+        @app.after_request
+        def record_request(response):
+            start = g.pop("metrics_start", None)
+            if start is not None:
+                key = (request.endpoint or "unknown", request.method)
+                self.observe(self.http_seconds, key, time.perf_counter() - start)
+                self.increment(self.http_responses, key + (str(response.status_code),))
+            return response
+
+        @app.teardown_request
+        def record_request_error(exc):
+            if exc is not None and g.get("metrics_http"):
+                self.increment(self.http_errors, (request.endpoint or "unknown", request.method))
+
+    # --- Prometheus Text Format ---
+    def render(self):
+        with self.lock:
+            lines = []
+            self._render_gauge(lines, "uptime_seconds", "Seconds since the server started.", time.time() - self.started_at)
+            self._render_histograms(
+                lines, "socketio_handler_seconds", "Socket.IO handler latency.", self.handler_seconds, ("event",)
+            )
+            self._render_counters(
+                lines, "socketio_handler_errors_total", "Socket.IO handler exceptions.", self.handler_errors, ("event",)
+            )
+            self._render_histograms(
+                lines, "http_request_seconds", "HTTP route latency.", self.http_seconds, ("endpoint", "method")
+            )
+            self._render_counters(
+                lines, "http_responses_total", "HTTP responses by status.", self.http_responses, ("endpoint", "method", "status")
+            )
+            self._render_counters(
+                lines, "http_errors_total", "HTTP requests that raised.", self.http_errors, ("endpoint", "method")
+            )
+            self._render_histograms(
+                lines, "section_seconds", "Named sections inside handlers.", self.section_seconds, ("section",)
+            )
+            self._render_counters(
+                lines, "emitted_bytes_total", "Encoded bytes sent to clients.", self.emitted_bytes, ("event",)
+            )
+            self._render_counters(
+                lines, "emitted_messages_total", "Frames sent to clients.", self.emitted_messages, ("event",)
+            )
+        return "\n".join(lines) + "\n"
+
+    def _labels(self, names, key):
+        values = key if isinstance(key, tuple) else (key,)
+        pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+        return ",".join(pairs)
+
+    def _render_gauge(self, lines, name, help_text, value):
+        name = f"{self.prefix}_{name}"
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value:.3f}"]
+
+    def _render_counters(self, lines, name, help_text, table, label_names):
+        name = f"{self.prefix}_{name}"
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for key, value in sorted(table.items()):
+            lines.append(f"{name}{{{self._labels(label_names, key)}}} {value}")
+
+    def _render_histograms(self, lines, name, help_text, table, label_names):
+        name = f"{self.prefix}_{name}"
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for key, histogram in sorted(table.items()):
+            labels = self._labels(label_names, key)
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"{name}_sum{{{labels}}} {histogram.sum:.6f}")
+            lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
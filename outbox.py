@@ -0,0 +1,123 @@
+"""
+outbox.py
+Version: 1.0.0
+Emit coalescing. While a Socket.IO handler (or timer callback) runs, emits are
+buffered per recipient instead of sent. When it finishes, every recipient gets a
+single frame: the event itself if only one was addressed to it, otherwise
+"batch" with {"events": [[event, data], ...]} in emit order.
+Recipients with the same sequence share one emit, so room broadcasts are still
+encoded once.
+With a message queue (several workers) only emits to this worker's own
+connections are buffered. Room emits flush the buffer and go through the queue,
+so members connected to another worker still get them, in order.
+"""
+import threading
+from contextlib import contextmanager
+
+from socketio import PubSubManager
+
+BATCH_EVENT = "batch"
+
+
+class Outbox:
+    def __init__(self):
+        self.local = threading.local()  # greenlet-local under gevent
+        self.server = None
+        self.queued = False  # True when a message queue links several workers
+
+    def install(self, socketio):
+        """Wraps every registered handler and server.emit. Call after the last @socketio.on."""
+        self.server = socketio.server
+        self.queued = isinstance(self.server.manager, PubSubManager)
+        for handlers in self.server.handlers.values():
+            for event, handler in list(handlers.items()):
+                handlers[event] = self.wrap_handler(handler)
+
+        original_emit = self.server.emit
+
+        def buffered_emit(event, data=None, to=None, room=None, skip_sid=None, namespace=None, callback=None, **kwargs):
+            to = to or room
+            namespace = namespace or "/"
+            passthrough = self.queued and not self.is_local_sid(to, namespace)
+            if passthrough:
+                self.flush()  # keep the order of anything buffered before it
+            if getattr(self.local, "entries", None) is None or callback is not None or passthrough:
+                return original_emit(
+                    event,
+                    data,
+                    to=to,
+                    skip_sid=skip_sid,
+                    namespace=namespace,
+                    callback=callback,
+                    **kwargs,
+                )
+            self.buffer(event, data, to, skip_sid, namespace)
+
+        self.server.emit = buffered_emit
+
+    def is_local_sid(self, to, namespace):
+        return isinstance(to, str) and self.server.manager.is_connected(to, namespace)
+
+    def wrap_handler(self, handler):
+        def coalescing_handler(*args):
+            with self.collect():
+                return handler(*args)
+
+        return coalescing_handler
+
+    @contextmanager
+    def collect(self):
+        """Buffers emits for the duration of the block. Nested blocks join the outer one."""
+        if getattr(self.local, "entries", None) is not None:
+            yield
+            return
+        self.local.entries = []  # [(event, data, namespace)]
+        self.local.recipients = {}  # Dict[(namespace, sid), List[entry index]]
+        try:
+            yield
+        finally:
+            try:
+                self.flush()
+            finally:
+                self.local.entries = None
+                self.local.recipients = None
+
+    def buffer(self, event, data, room, skip_sid, namespace):
+        # Expand the room now, so membership changes later in the handler
+        # do not change who receives this event
+        if not isinstance(skip_sid, list):
+            skip_sid = [skip_sid]
+        index = len(self.local.entries)
+        self.local.entries.append((event, data, namespace))
+        recipients = self.local.recipients
+        for sid, _ in self.server.manager.get_participants(namespace, room):
+            if sid not in skip_sid:
+                recipients.setdefault((namespace, sid), []).append(index)
+
+    def flush(self):
+        """Sends everything buffered so far (e.g. before a pause) and keeps collecting."""
+        entries = getattr(self.local, "entries", None)
+        if not entries:
+            return
+        recipients = self.local.recipients
+
+        # Emits made while flushing go straight out
+        self.local.entries = None
+        self.local.recipients = None
+        try:
+            groups = {}  # Dict[(namespace, entry indexes), List[sid]]
+            for (namespace, sid), indexes in recipients.items():
+                groups.setdefault((namespace, tuple(indexes)), []).append(sid)
+
+            for (namespace, indexes), sids in groups.items():
+                if len(indexes) == 1:
+                    event, data, _ = entries[indexes[0]]
+                else:
+                    event = BATCH_EVENT
+                    data = {"events": [[entries[i][0], entries[i][1]] for i in indexes]}
+                # Through the outermost server.emit, so /metrics still sees the frame.
+                # Every sid is connected here, so skip the message queue round trip.
+                self.server.emit(event, data, to=sids, namespace=namespace, ignore_queue=True)
+        finally:
+            self.local.entries = []
+            self.local.recipients = {}
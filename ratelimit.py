@@ -0,0 +1,82 @@
+"""
+ratelimit.py
+Version: 1.0.0
+Token bucket rate limiting for HTTP routes and Socket.IO events. Each limit
+keeps its buckets in an OrderedDict in last-seen order: a bucket untouched
+long enough to refill completely is the same as a new one, so it is evicted,
+and the store is capped at max_keys. Memory stays flat however many IPs and
+sids come and go, and every check is O(1) amortized.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBuckets:
+    def __init__(self, rate, burst, max_keys):
+        self.rate = float(rate)  # tokens added per second
+        self.burst = float(burst)  # bucket size, requests allowed back to back
+        self.ttl = self.burst / self.rate  # seconds for an empty bucket to refill
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()  # Dict[key, (tokens, last_seen)], oldest first
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.buckets)
+
+    def allow(self, key, now=None):
+        """Takes one token for key. False means the request should be refused."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.evict(now)
+            bucket = self.buckets.pop(key, None)
+            if bucket is None:
+                tokens = self.burst
+            else:
+                tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.buckets[key] = (tokens, now)
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+            return allowed
+
+    def evict(self, now):
+        # Oldest first, so stop at the first bucket that is still refilling
+        while self.buckets:
+            _, (_, last_seen) = next(iter(self.buckets.items()))
+            if now - last_seen < self.ttl:
+                break
+            self.buckets.popitem(last=False)
+
+    def forget(self, key):
+        with self.lock:
+            self.buckets.pop(key, None)
+
+
+class RateLimiter:
+    """
+    Named limits, e.g. {"join": {"rate": 0.5, "burst": 3}}.
+    rate_limiter.allow("join", client_ip). Names without a limit always pass.
+    """
+
+    def __init__(self, limits, max_keys=10000):
+        self.limits = {
+            name: TokenBuckets(limit["rate"], limit["burst"], max_keys)
+            for name, limit in limits.items()
+        }
+
+    def allow(self, name, key):
+        limit = self.limits.get(name)
+        return limit is None or limit.allow(key)
+
+    def forget(self, key):
+        """Drops key (e.g. a disconnected sid) from every limit."""
+        for limit in self.limits.values():
+            limit.forget(key)
+
+    def reset(self):
+        for limit in self.limits.values():
+            with limit.lock:
+                limit.buckets.clear()
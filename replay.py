@@ -0,0 +1,120 @@
+"""
+replay.py
+Version: 1.0.0
+Rebuilds a game offline from its journal (see journal.py, JOURNAL_DIR in
+.env.werewolves). Every recorded call is applied to a Game restored from the
+journal's snapshot, and random draws are fed back in recorded order, so death
+cascades play out exactly as they did on the server.
+
+Usage:
+    python replay.py journals/W-1760000000.wwj
+    python replay.py journals/W-1760000000.wwj --until 40 --state
+    python replay.py journals/W-1760000000.wwj --profile --repeat 200
+"""
+import argparse
+import contextlib
+import cProfile
+import json
+import pstats
+import sys
+import time
+
+from game_engine import Game
+from journal import (
+    CALL_OPCODES,
+    OP_RESTORE,
+    OP_RNG,
+    OP_START,
+    OPCODE_NAMES,
+    ReplayCursor,
+    ReplayRandom,
+    read_journal,
+)
+from simulator import NullWriter
+
+
+def replay(records, until=None, on_record=None):
+    """
+    Applies records[:until] and returns the Game.
+    on_record(index, opcode, payload, result) is called after each applied call.
+    """
+    cursor = ReplayCursor(records)
+    stop = len(records) if until is None else min(until, len(records))
+    game = None
+    while cursor.index < stop:
+        index = cursor.index
+        opcode, payload = cursor.next_record()
+        if opcode in (OP_START, OP_RESTORE):
+            game = Game.from_snapshot(payload)
+            game.rng = ReplayRandom(cursor)
+            result = None
+        elif opcode == OP_RNG:
+            raise ValueError(f"Replay diverged: random draw at record {index} was not used")
+        elif opcode in CALL_OPCODES:
+            if game is None:
+                raise ValueError(f"Record {index} comes before the journal snapshot")
+            result = getattr(game, CALL_OPCODES[opcode])(*payload)
+        else:
+            raise ValueError(f"Unknown opcode {opcode} at record {index}")
+        if on_record:
+            on_record(index, opcode, payload, result)
+    return game
+
+
+def print_record(index, opcode, payload, result, file=None):
+    if opcode in (OP_START, OP_RESTORE):
+        roles = ", ".join(
+            f"{p['name']}={p['role']['class'] if p['role'] else None}" for p in payload["players"]
+        )
+        line = f"[{index}] {OPCODE_NAMES[opcode]} phase={payload['phase']} {roles}"
+    else:
+        line = f"[{index}] {OPCODE_NAMES[opcode]}({json.dumps(payload)[1:-1]}) -> {json.dumps(result, default=str)}"
+    print(line, file=file)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a Werewolves game journal")
+    parser.add_argument("journal", help="Path to a .wwj journal file")
+    parser.add_argument("--until", type=int, help="Stop before this record index")
+    parser.add_argument("--state", action="store_true", help="Print the final Game snapshot as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Keep the engine's own log lines")
+    parser.add_argument("--profile", action="store_true", help="Profile the replay with cProfile")
+    parser.add_argument("--repeat", type=int, default=1, help="Replays to run (timing and profiling)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    records = read_journal(args.journal)
+    print(f"{args.journal}: {len(records)} records")
+
+    # Records always go to the terminal, the engine's own prints only with --verbose
+    out = sys.stdout
+    engine_log = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(NullWriter())
+    with engine_log:
+        game = replay(records, args.until, on_record=lambda *record: print_record(*record, file=out))
+
+    if args.repeat > 1 or args.profile:
+        profiler = cProfile.Profile() if args.profile else None
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(NullWriter()):
+            if profiler:
+                profiler.enable()
+            for _ in range(args.repeat):
+                replay(records, args.until)
+            if profiler:
+                profiler.disable()
+        elapsed = time.perf_counter() - start
+        print(f"{args.repeat} replays in {elapsed:.3f}s ({elapsed / args.repeat * 1000:.3f} ms each)")
+        if profiler:
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+
+    if game:
+        alive = [p.name for p in game.players.values() if p.is_alive]
+        print(f"Phase: {game.phase} | Winner: {game.winner} | Alive: {', '.join(alive)}")
+        if args.state:
+            print(json.dumps(game.to_snapshot(), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ Version: 5.1.0
 Defines the behavior of all roles using a generic base class and specific subclasses.
 """
 import random
+import types
 
 # --- Roles ---
 # Simplified keys, add manually to lobby.html
@@ -58,6 +59,39 @@ def register_role(cls):
     return cls
 
 
+# --- game_context Lookups ---
+# Game.build_context() adds id and living indexes, contexts that only carry
+# {"players": [...]} (tests, tools) fall back to a scan.
+def find_player(game_context, player_id):
+    players_by_id = game_context.get("players_by_id")
+    if players_by_id is not None:
+        return players_by_id.get(player_id)
+    return next((p for p in game_context["players"] if p.id == player_id), None)
+
+
+def all_living(game_context):
+    living = game_context.get("living")
+    if living is not None:
+        return list(living.values())
+    return [p for p in game_context["players"] if p.is_alive]
+
+
+def living_team(game_context, team):
+    living_by_team = game_context.get("living_by_team")
+    if living_by_team is not None:
+        return list(living_by_team.get(team, {}).values())
+    return [p for p in game_context["players"] if p.is_alive and p.role.team == team]
+
+
+def living_role(game_context, name_key):
+    living_by_role = game_context.get("living_by_role")
+    if living_by_role is not None:
+        return list(living_by_role.get(name_key, {}).values())
+    return [
+        p for p in game_context["players"] if p.is_alive and p.role.name_key == name_key
+    ]
+
+
 # 2. The Base Generic Class
 class Role:
     name_key = "Unknown"
@@ -76,10 +110,11 @@ class Role:
         self.is_night_active = False
         self.player_id = None
 
-    def on_assign(self, player_obj):
+    def on_assign(self, player_obj, game_context=None):
         """
         Called once when the role is assigned to the player.
         Use this to apply permanent status effects.
+        game_context carries the game's "rng" for roles that draw at assignment.
         """
         self.player_id = player_obj.id
         pass
@@ -149,6 +184,37 @@ class Role:
             "team": self.team,
         }
 
+    def to_snapshot(self):
+        """
+        Instance state for crash recovery snapshots, JSON types only.
+        Methods bound onto the instance (a promoted Mayor) are stored by name.
+        """
+        state = {}
+        borrowed = {}
+        for attr, value in vars(self).items():
+            if isinstance(value, types.MethodType):
+                borrowed[attr] = value.__func__.__qualname__  # e.g. "Mayor.night_action"
+            elif isinstance(value, set):
+                state[attr] = {"set": sorted(value)}
+            else:
+                state[attr] = value
+        return {"class": type(self).__name__, "state": state, "borrowed": borrowed}
+
+
+def role_from_snapshot(data):
+    """Rebuilds a role from Role.to_snapshot() without rerunning __init__."""
+    role_cls = AVAILABLE_ROLES[data["class"]]
+    role = role_cls.__new__(role_cls)
+    for attr, value in data["state"].items():
+        if isinstance(value, dict) and list(value) == ["set"]:
+            value = set(value["set"])
+        setattr(role, attr, value)
+    for attr, qualname in data.get("borrowed", {}).items():
+        owner_name, func_name = qualname.split(".")
+        func = getattr(AVAILABLE_ROLES[owner_name], func_name)
+        setattr(role, attr, func.__get__(role, role_cls))
+    return role
+
 
 # --- Specific Role Implementations ---
 
@@ -270,11 +336,11 @@ class Alpha_Werewolf(Werewolf):
         if not player_obj.is_alive:
             return False
 
-        living_players = [p for p in game_context["players"] if p.is_alive]
+        living_players = all_living(game_context)
         if len(living_players) == 1:
             return True
 
-        werewolves = [p for p in living_players if p.role.team == "Werewolves"]
+        werewolves = living_team(game_context, "Werewolves")
         if len(werewolves) > 1:
             return False
 
@@ -360,9 +426,7 @@ class Cupid(Villager):
                 print("Cupid Error: Second target not found in metadata.")
                 return {}
 
-            target_player_obj2 = next(
-                (p for p in game_context["players"] if p.id == target_player_id2), None
-            )
+            target_player_obj2 = find_player(game_context, target_player_id2)
             if not target_player_obj2:
                 print("Cupid Error: Second target not found.")
                 return {}
@@ -417,11 +481,11 @@ class Demented(Villager):
         if not player_obj.is_alive:
             return False
 
-        living_players = [p for p in game_context["players"] if p.is_alive]
+        living_players = all_living(game_context)
         if len(living_players) == 1:
             return True
 
-        werewolves = [p for p in living_players if p.role.team == "Werewolves"]
+        werewolves = living_team(game_context, "Werewolves")
 
         if len(werewolves) > 0:
             return False
@@ -462,6 +526,7 @@ class Honeypot(Villager):
 
     def on_death(self, player_obj, game_context):
         reason = game_context.get("reason", "")
+        rng = game_context.get("rng", random)
 
         # 1. Lynch Retaliation: Kill a random "Yes" voter
         if reason == "Lynched":
@@ -473,17 +538,15 @@ class Honeypot(Villager):
             ]
 
             # Filter for ALIVE voters only
-            alive_yes_voters = [
-                pid
-                for pid in yes_voters
-                if any(p.id == pid and p.is_alive for p in game_context["players"])
-            ]
+            alive_yes_voters = []
+            for pid in yes_voters:
+                voter = find_player(game_context, pid)
+                if voter and voter.is_alive:
+                    alive_yes_voters.append(pid)
 
             if alive_yes_voters:
-                target_id = random.choice(alive_yes_voters)
-                target_player_obj = next(
-                    (p for p in game_context["players"] if p.id == target_id), None
-                )
+                target_id = rng.choice(alive_yes_voters)
+                target_player_obj = find_player(game_context, target_id)
                 msg = "Honeypot Retaliation"
                 if target_player_obj:
                     msg = f"Honeypot retaliation: <strong>{target_player_obj.name}</strong> selected from lynch mob. They were a {target_player_obj.role.name_key}!"
@@ -492,13 +555,9 @@ class Honeypot(Villager):
 
         # 2. Werewolf Retaliation: Kill a random Werewolf
         elif reason == "Werewolf meat":
-            wolves = [
-                p
-                for p in game_context["players"]
-                if p.is_alive and p.role.team == "Werewolves"
-            ]
+            wolves = living_team(game_context, "Werewolves")
             if wolves:
-                target = random.choice(wolves)
+                target = rng.choice(wolves)
                 msg = (
                     f"Honeypot retaliation: {target.name} selected from werewolf pack."
                 )
@@ -507,26 +566,18 @@ class Honeypot(Villager):
 
         # 3. Witch Retaliation: Kill the Witch
         elif reason == "Witch Poison":
-            witches = [
-                p
-                for p in game_context["players"]
-                if p.is_alive and p.role.name_key == "Witch"
-            ]
+            witches = living_role(game_context, ROLE_WITCH)
             if witches:
-                target = random.choice(witches)
+                target = rng.choice(witches)
                 msg = f"Honeypot retaliation: {target.name} is taking an acid bath."
                 print(msg)
                 return {"kill": target.id, "reason": msg}
 
         # 4. Serial Killer Retaliation: Kill the Serial Killer
         elif reason == "Serial Killer":
-            killers = [
-                p
-                for p in game_context["players"]
-                if p.is_alive and p.role.name_key == "Serial_Killer"
-            ]
+            killers = living_role(game_context, ROLE_SERIAL_KILLER)
             if killers:
-                target = random.choice(killers)
+                target = rng.choice(killers)
                 msg = (
                     f"Honeypot retaliation: {target.name} is sleeping with the fishies."
                 )
@@ -623,9 +674,7 @@ class Backlash_Werewolf(Hunter):
         if backlash_id:
             self.failsafe_id = backlash_id
             backlash_name = "Unknown"
-            found_player = next(
-                (p for p in game_context["players"] if p.id == backlash_id), None
-            )
+            found_player = find_player(game_context, backlash_id)
             if found_player:
                 backlash_name = found_player.name
 
@@ -684,15 +733,8 @@ class Martyr(Villager):
 
     def on_death(self, player_obj, game_context):
         # Let's do: If I die, I give a "blessing" (armor) to a random living player.
-        lucky_person = next(
-            (
-                p
-                for p in game_context["players"]
-                if p.is_alive and p.id == self.failsafe_id
-            ),
-            None,
-        )
-        if lucky_person:
+        lucky_person = find_player(game_context, self.failsafe_id)
+        if lucky_person and lucky_person.is_alive:
             lucky_person.status_effects.append("2nd_life")
             print(f"Martyr died and blessed {lucky_person.name}")
 
@@ -776,9 +818,7 @@ class Mayor(Villager):
     def on_night_start(self, player_obj, game_context):
         """if next_mayor is dead, choose new next_mayor"""
         if self.next_mayor_id and self.next_mayor_id != "not_set_yet":
-            next_mayor = next(
-                (p for p in game_context["players"] if p.id == self.next_mayor_id), None
-            )
+            next_mayor = find_player(game_context, self.next_mayor_id)
             if next_mayor and not next_mayor.is_alive:
                 self.is_night_active = True
 
@@ -786,16 +826,9 @@ class Mayor(Villager):
         if not self.next_mayor_id or self.next_mayor_id == "not_set_yet":
             return {}
 
-        new_mayor = next(
-            (
-                p
-                for p in game_context["players"]
-                if p.is_alive and p.id == self.next_mayor_id
-            ),
-            None,
-        )
+        new_mayor = find_player(game_context, self.next_mayor_id)
 
-        if new_mayor:
+        if new_mayor and new_mayor.is_alive:
             new_mayor.role.next_mayor_id = "not_set_yet"
             # only GOOD_MAYORS can pass on mayor title
             if new_mayor.role.name_key in GOOD_MAYORS:
@@ -836,7 +869,7 @@ class Monster(Villager):
     def __init__(self):
         super().__init__()
 
-    def on_assign(self, player_obj):
+    def on_assign(self, player_obj, game_context=None):
         # This is checked by the Engine when calculating deaths
         player_obj.status_effects.append("immune_to_wolf")
 
@@ -845,11 +878,11 @@ class Monster(Villager):
         if not player_obj.is_alive:
             return False
 
-        living_players = [p for p in game_context["players"] if p.is_alive]
+        living_players = all_living(game_context)
         if len(living_players) == 1:
             return True
 
-        werewolves = [p for p in living_players if p.role.team == "Werewolves"]
+        werewolves = living_team(game_context, "Werewolves")
 
         if len(living_players) == 2 and len(werewolves) == 1:
             return True
@@ -915,8 +948,13 @@ class Random_Seer(Seer):
 
     def __init__(self):
         super().__init__()
-        # insane, naive, paranoid, normal
-        self.sanity = random.choice(["insane", "naive", "paranoid", "normal"])
+        # insane, naive, paranoid, normal (drawn in on_assign)
+        self.sanity = "normal"
+
+    def on_assign(self, player_obj, game_context=None):
+        super().on_assign(player_obj, game_context)
+        rng = (game_context or {}).get("rng", random)
+        self.sanity = rng.choice(["insane", "naive", "paranoid", "normal"])
 
     def investigate(self, target_player):
         actual = super().investigate(target_player)  # "Werewolf" or "Villager"
@@ -1002,7 +1040,7 @@ class Serial_Killer(Role):
         if not player_obj.is_alive:
             return False
 
-        living_players = [p for p in game_context["players"] if p.is_alive]
+        living_players = all_living(game_context)
 
         if len(living_players) == 1:
             return True
@@ -1096,7 +1134,7 @@ class Tough_Villager(Villager):
     def __init__(self):
         super().__init__()
 
-    def on_assign(self, player_obj):
+    def on_assign(self, player_obj, game_context=None):
         player_obj.status_effects.append("2nd_life")
 
 
@@ -1109,7 +1147,7 @@ class Tough_Werewolf(Werewolf):
     def __init__(self):
         super().__init__()
 
-    def on_assign(self, player_obj):
+    def on_assign(self, player_obj, game_context=None):
         player_obj.status_effects.append("2nd_life")
 
 
@@ -1134,9 +1172,7 @@ class Wild_Child(Villager):
     def on_night_start(self, player_obj, game_context):
         # Check if Model died
         if self.role_model_id and self.transformed == False:
-            model = next(
-                (p for p in game_context["players"] if p.id == self.role_model_id), None
-            )
+            model = find_player(game_context, self.role_model_id)
             if model and not model.is_alive:
                 self.transformed = True
                 self.team = "Werewolves"
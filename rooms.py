@@ -0,0 +1,306 @@
+"""
+rooms.py
+Version: 1.0.0
+Registry of concurrent game rooms. Each room owns its engine Game plus the
+connection/wrapper and lobby state that app.py used to keep in module globals.
+"""
+import os
+import threading
+import time
+
+from config import GAME_DEFAULTS
+from game_engine import Game, PHASE_LOBBY
+from journal import Journal, OP_RESTORE
+
+
+# Socket.IO sub-rooms per table, named f"{code}:{channel}"
+CHAT_CHANNELS = ("living", "ghost", "werewolves")
+
+
+class Room:
+    def __init__(self, code, on_game_created=None):
+        self.created_at = time.time()
+        self.last_activity = self.created_at
+
+        # Game Dictionary stores connection/wrapper info
+        self.game = {
+            "admin_sid": None,
+            "game_code": code,
+            "game_state": PHASE_LOBBY,
+            "players": {},  # Dict[player_id(uuid), PlayerWrapper_Obj]
+        }
+
+        self.lobby_state = {
+            "selected_roles": list(GAME_DEFAULTS["DEFAULT_ROLES"]),
+            "settings": {},
+        }
+
+        self.on_game_created = on_game_created  # callback(room) after each new Game
+        self.lock = threading.RLock()  # serializes this table's handlers, shared with Game.lock
+        self.game_instance = None
+        self.public_state_cache = None  # (Game.version, public state dict)
+        self.snapshot_key = None  # phase boundary of the last snapshot written
+        self.private_cache = {}  # Dict[player_id, (key, (role, night_ui, valid_targets))]
+        self.pending_transition = None  # continuation waiting out PAUSE_DURATION
+        self.restored_transition = None  # its name from a snapshot, app.py queues it again
+        self.reset_game()
+
+    @property
+    def code(self):
+        return self.game["game_code"]
+
+    def reset_game(self, settings=None):
+        """Replaces the engine Game (new code or rematch), keeping the wrappers."""
+        if self.game_instance:
+            self.game_instance.close_journal()
+        self.game_instance = Game(self.code, settings=settings, lock=self.lock)
+        self.public_state_cache = None
+        self.private_cache = {}
+        self.pending_transition = None
+        if self.on_game_created:
+            self.on_game_created(self)
+        return self.game_instance
+
+    def touch(self):
+        self.last_activity = time.time()
+
+    def channel(self, name):
+        """Socket.IO room for one chat channel of this table, e.g. "W:ghost"."""
+        return f"{self.code}:{name}"
+
+    def admin_id(self):
+        """Player id of the admin, also while a restored admin has not reconnected yet."""
+        for player_id, wrapper in self.game["players"].items():
+            if wrapper.is_admin:
+                return player_id
+        return None
+
+    def has_connected_players(self):
+        return any(
+            getattr(w, "connected", True) for w in self.game["players"].values()
+        )
+
+    # --- Snapshots ---
+    def to_snapshot(self):
+        return {
+            "code": self.code,
+            "created_at": self.created_at,
+            "game_state": self.game["game_state"],
+            "game_over_data": self.game.get("game_over_data"),
+            "players": {
+                player_id: {
+                    "name": wrapper.name,
+                    "is_admin": wrapper.is_admin,
+                    "language": wrapper.language,
+                }
+                for player_id, wrapper in self.game["players"].items()
+            },
+            "lobby_state": self.lobby_state,
+            "pending_transition": getattr(self.pending_transition, "__name__", None),
+            "game_instance": self.game_instance.to_snapshot(),
+        }
+
+    @classmethod
+    def from_snapshot(cls, data, restore_wrapper, on_game_created=None):
+        """restore_wrapper(dict) -> PlayerWrapper, disconnected until the player reconnects."""
+        room = cls(data["code"])
+        room.created_at = data["created_at"]
+        room.game["game_state"] = data["game_state"]
+        if data["game_over_data"]:
+            room.game["game_over_data"] = data["game_over_data"]
+        room.game["players"] = {
+            player_id: restore_wrapper(wrapper)
+            for player_id, wrapper in data["players"].items()
+        }
+        room.lobby_state = data["lobby_state"]
+        room.game_instance = Game.from_snapshot(data["game_instance"], lock=room.lock)
+        # Keep recording into the same journal, replay resets to this point
+        journal_path = data["game_instance"].get("journal_path")
+        if journal_path and os.path.exists(journal_path):
+            room.game_instance.start_journal(Journal(journal_path), OP_RESTORE)
+        room.restored_transition = data.get("pending_transition")
+        room.on_game_created = on_game_created
+        if on_game_created:
+            on_game_created(room)
+        return room
+
+
+class RoomRegistry:
+    """
+    Maps game codes to Room objects and player ids to the code of the room
+    they joined, so any handler can resolve its room from the session.
+    Also keeps a bidirectional sid <-> player_id index so socket lookups are O(1).
+    """
+
+    def __init__(
+        self,
+        max_rooms=None,
+        idle_timeout=None,
+        on_game_created=None,
+        snapshots=None,
+        restore_wrapper=None,
+    ):
+        self.rooms = {}  # Dict[game_code, Room]
+        self.player_rooms = {}  # Dict[player_id, game_code]
+        self.sid_players = {}  # Dict[sid, player_id]
+        self.player_sids = {}  # Dict[player_id, sid]
+        self.lock = threading.RLock()  # creating, restoring, renaming and removing rooms
+        self.on_game_created = on_game_created
+        self.snapshots = snapshots  # SnapshotStore or None
+        self.restore_wrapper = restore_wrapper  # callback(dict) -> PlayerWrapper
+        self.max_rooms = max_rooms or GAME_DEFAULTS["MAX_ROOMS"]
+        self.idle_timeout = idle_timeout or GAME_DEFAULTS["ROOM_IDLE_TIMEOUT"]
+
+    def __len__(self):
+        return len(self.rooms)
+
+    def __contains__(self, code):
+        return self.get(code) is not None
+
+    def values(self):
+        # Copy so callers may create/remove rooms while iterating
+        return list(self.rooms.values())
+
+    def get(self, code):
+        if not code:
+            return None
+        room = self.rooms.get(code)
+        if room:
+            return room
+        with self.lock:
+            return self.rooms.get(code) or self.restore(code)
+
+    def is_full(self):
+        return len(self.rooms) >= self.max_rooms
+
+    def get_or_create(self, code):
+        """Returns the room for code, creating it if there is capacity left."""
+        room = self.get(code)
+        if room:
+            return room
+        with self.lock:
+            room = self.get(code)  # another connection may have created it meanwhile
+            if room:
+                return room
+            self.prune_idle()
+            if self.is_full():
+                return None
+            room = Room(code, on_game_created=self.on_game_created)
+            self.rooms[code] = room
+            print(f"Room {code} created ({len(self.rooms)} active).")
+            return room
+
+    def remove(self, code):
+        with self.lock:
+            room = self.rooms.pop(code, None)
+            if self.snapshots:
+                self.snapshots.delete(code)
+            if not room:
+                return None
+            room.game_instance.close_journal()
+            for player_id in room.game["players"]:
+                if self.player_rooms.get(player_id) == code:
+                    self.unbind_player(player_id)
+            print(f"Room {code} removed ({len(self.rooms)} active).")
+            return room
+
+    def rename(self, old_code, new_code):
+        """Moves a room to a new code. Fails if the new code is taken."""
+        with self.lock:
+            if new_code in self.rooms:
+                return False
+            room = self.rooms.pop(old_code)
+            room.game["game_code"] = new_code
+            self.rooms[new_code] = room
+            for player_id in room.game["players"]:
+                self.player_rooms[player_id] = new_code
+            if self.snapshots:
+                self.snapshots.delete(old_code)
+                room.snapshot_key = None
+            return True
+
+    # --- Snapshots ---
+    def checkpoint(self, room):
+        """Snapshots room once per phase boundary (and lobby roster change)."""
+        if not self.snapshots or self.rooms.get(room.code) is not room:
+            return
+        game = room.game_instance
+        key = (
+            id(game),
+            game.phase,
+            game.current_timer_id,
+            len(room.game["players"]),
+            room.pending_transition is not None,
+        )
+        if key == room.snapshot_key:
+            return
+        if self.snapshots.save(room.code, room.to_snapshot()):
+            room.snapshot_key = key
+
+    def restore(self, code):
+        """Brings a snapshotted room back after a restart. None if there is none."""
+        if not self.snapshots:
+            return None
+        data = self.snapshots.load(code)
+        if not data:
+            return None
+        try:
+            room = Room.from_snapshot(data, self.restore_wrapper, self.on_game_created)
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"WARNING: Snapshot of room {code} could not be restored: {e}")
+            return None
+        self.rooms[code] = room
+        for player_id in room.game["players"]:
+            self.bind_player(player_id, code)
+        print(f"Room {code} restored from snapshot ({len(self.rooms)} active).")
+        return room
+
+    # --- Player Index ---
+    def bind_player(self, player_id, code):
+        self.player_rooms[player_id] = code
+
+    def unbind_player(self, player_id):
+        self.player_rooms.pop(player_id, None)
+        self.unbind_sid(self.player_sids.get(player_id))
+
+    def room_for_player(self, player_id):
+        if not player_id:
+            return None
+        return self.rooms.get(self.player_rooms.get(player_id))
+
+    # --- Session ID Index ---
+    def bind_sid(self, sid, player_id):
+        """Points sid at player_id, replacing the player's previous connection."""
+        old_sid = self.player_sids.get(player_id)
+        if old_sid and old_sid != sid:
+            self.sid_players.pop(old_sid, None)
+        old_player_id = self.sid_players.get(sid)
+        if old_player_id and old_player_id != player_id:
+            self.player_sids.pop(old_player_id, None)
+        self.sid_players[sid] = player_id
+        self.player_sids[player_id] = sid
+
+    def unbind_sid(self, sid):
+        player_id = self.sid_players.pop(sid, None)
+        if player_id and self.player_sids.get(player_id) == sid:
+            del self.player_sids[player_id]
+
+    def player_for_sid(self, sid):
+        return self.sid_players.get(sid)
+
+    def sid_for_player(self, player_id):
+        return self.player_sids.get(player_id)
+
+    def lookup_sid(self, sid):
+        """Returns (room, player_id) for a connected socket in any room."""
+        player_id = self.sid_players.get(sid)
+        if not player_id:
+            return None, None
+        return self.room_for_player(player_id), player_id
+
+    def prune_idle(self):
+        """Drops rooms nobody has been connected to for idle_timeout seconds."""
+        cutoff = time.time() - self.idle_timeout
+        for room in self.values():
+            if room.last_activity < cutoff and not room.has_connected_players():
+                self.remove(room.code)
@@ -0,0 +1,95 @@
+"""
+scheduler.py
+Version: 1.0.0
+Deadline priority queue shared by every room.
+One background task sleeps until the earliest deadline instead of polling each game every second.
+"""
+import heapq
+import itertools
+import threading
+import time
+import traceback
+
+
+class TimerScheduler:
+    def __init__(self, start_task, create_event):
+        """
+        Args:
+            start_task: starts a background task (socketio.start_background_task)
+            create_event: creates an Event for the active async mode
+        """
+        self.start_task = start_task
+        self.create_event = create_event
+        self._heap = []  # [deadline, seq, callback, args, cancelled]
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = None
+        self._running = False
+
+    def __len__(self):
+        return len(self._heap)
+
+    def start(self):
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._wakeup = self.create_event()
+        self.start_task(self._run)
+        print(">>> Timer Scheduler Started <<<")
+
+    def stop(self):
+        self._running = False
+        if self._wakeup:
+            self._wakeup.set()
+
+    def schedule(self, deadline, callback, *args):
+        """
+        Runs callback(*args) in its own background task once time.time() >= deadline.
+        Returns the entry, which can be passed to cancel().
+        """
+        entry = [deadline, next(self._counter), callback, args, False]
+        with self._lock:
+            heapq.heappush(self._heap, entry)
+            is_next = self._heap[0] is entry
+        if not self._running:
+            self.start()
+        elif is_next:
+            # New earliest deadline: wake the loop so it re-computes its sleep
+            self._wakeup.set()
+        return entry
+
+    def cancel(self, entry):
+        """Lazy deletion, the entry is dropped when it reaches the top of the heap."""
+        entry[4] = True
+
+    def _pop_due(self):
+        """Returns due callbacks and the seconds until the next deadline (None if empty)."""
+        due = []
+        with self._lock:
+            self._wakeup.clear()
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                entry = heapq.heappop(self._heap)
+                if not entry[4]:
+                    due.append(entry)
+            while self._heap and self._heap[0][4]:
+                heapq.heappop(self._heap)
+            timeout = self._heap[0][0] - now if self._heap else None
+        return due, timeout
+
+    def _run(self):
+        while self._running:
+            due, timeout = self._pop_due()
+            for _, _, callback, args, _ in due:
+                self.start_task(self._fire, callback, args)
+            if not due:
+                # Sleeps until the next deadline, or forever while no timer is pending
+                self._wakeup.wait(timeout)
+
+    def _fire(self, callback, args):
+        try:
+            callback(*args)
+        except Exception as e:
+            print(f"Timer callback {getattr(callback, '__name__', callback)} failed: {e}")
+            traceback.print_exc()
@@ -0,0 +1,427 @@
+"""
+simulator.py
+Version: 1.0.0
+Headless Monte Carlo driver for balance runs. Plays full games on game_engine.Game
+without Flask or Socket.IO and reports win rates per role set and player count.
+
+Usage:
+    python simulator.py --players 6,8,12 --roles Seer,Witch --games 10000 --seed 1
+    python simulator.py --players 8 --roles Seer --roles Seer,Cupid,Hunter --json
+    python simulator.py --players 12 --games 1000000 --workers 0  # all cores
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from config import GAME_DEFAULTS
+from game_engine import (
+    Game,
+    PHASE_ACCUSATION,
+    PHASE_LYNCH,
+    PHASE_NIGHT,
+)
+from roles import AVAILABLE_ROLES
+
+TEAM_WINNERS = ("Villagers", "Werewolves")
+
+
+class NullWriter:
+    """Swallows the engine's print() logging while simulating."""
+
+    def write(self, text):
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def role_key_map():
+    """name_key -> Role class, the same lookup assign_roles() uses."""
+    return {
+        getattr(role_cls, "name_key", role_name): role_cls
+        for role_name, role_cls in AVAILABLE_ROLES.items()
+    }
+
+
+def reason_key(reason):
+    """Death reasons are plain strings or translation dicts, histogram by key."""
+    if isinstance(reason, dict):
+        return reason.get("key", "unknown")
+    return str(reason)
+
+
+# --- Policies ---
+class RandomPolicy:
+    """
+    Uniformly random choices, shaped like the browser client's submissions.
+    Werewolves agree on one pack target per night (as they would in chat),
+    otherwise the unanimous wolf vote almost never lands.
+    """
+
+    def __init__(self, yes_chance=0.5, skip_chance=0.0):
+        self.yes_chance = yes_chance
+        self.skip_chance = skip_chance
+        self.rng = random.Random()
+        self._pack_night = None
+        self._pack_target = None
+
+    def seed(self, seed):
+        self.rng.seed(seed)
+        self._pack_night = None
+
+    def night_action(self, game, player, game_context):
+        """Returns the hero_choice payload ({target_id, metadata}) or 'Nobody'."""
+        schema = player.role.get_night_ui_schema(player, game_context)
+        targets = [t["id"] for t in schema.get("targets", [])]
+        if not targets:
+            return "Nobody"
+        if schema.get("can_skip") and self.rng.random() < self.skip_chance:
+            return "Nobody"
+
+        target_id = self.rng.choice(targets)
+        if player.role.team == "Werewolves":
+            target_id = self.pack_target(game, targets) or target_id
+        payload = {"target_id": target_id}
+
+        # Second dropdown: potion (Witch) or second player (Cupid/Backlash)
+        header = schema.get("template", {}).get("header", "")
+        if schema.get("potions"):
+            potion = self.rng.choice(schema["potions"])["id"]
+            payload["metadata"] = {"potion": potion}
+        elif "Cupid" in header or "Backlash" in header:
+            others = [t for t in targets if t != target_id]
+            if others:
+                payload["metadata"] = {"target_id2": self.rng.choice(others)}
+        return payload
+
+    def pack_target(self, game, targets):
+        if self._pack_night != game.night_count:
+            self._pack_night = game.night_count
+            prey = [p.id for p in game.get_living_players() if p.role.team != "Werewolves"]
+            self._pack_target = self.rng.choice(prey) if prey else None
+        return self._pack_target if self._pack_target in targets else None
+
+    def accuse(self, game, player):
+        candidates = [p.id for p in game.get_living_players() if p.id != player.id]
+        if not candidates or self.rng.random() < self.skip_chance:
+            return None
+        return self.rng.choice(candidates)
+
+    def lynch_vote(self, game, player, target_id):
+        return "yes" if self.rng.random() < self.yes_chance else "no"
+
+
+class ScriptedPolicy(RandomPolicy):
+    """
+    Plug in only the decisions you care about, the rest stay random.
+    Each hook receives (game, player, ...) and the policy rng as the last argument.
+    """
+
+    def __init__(self, night=None, accuse=None, lynch=None, **kwargs):
+        super().__init__(**kwargs)
+        self.night_hook = night
+        self.accuse_hook = accuse
+        self.lynch_hook = lynch
+
+    def night_action(self, game, player, game_context):
+        if self.night_hook:
+            return self.night_hook(game, player, game_context, self.rng)
+        return super().night_action(game, player, game_context)
+
+    def accuse(self, game, player):
+        if self.accuse_hook:
+            return self.accuse_hook(game, player, self.rng)
+        return super().accuse(game, player)
+
+    def lynch_vote(self, game, player, target_id):
+        if self.lynch_hook:
+            return self.lynch_hook(game, player, target_id, self.rng)
+        return super().lynch_vote(game, player, target_id)
+
+
+POLICIES = {"random": RandomPolicy}
+
+
+# --- Aggregates ---
+class SimulationStats:
+    """Compact, mergeable aggregates. Keys are winners and death reasons, never games."""
+
+    def __init__(self):
+        self.games = 0
+        self.days = 0
+        self.unfinished = 0
+        self.wins = Counter()  # winner team or "Solo:<role>"
+        self.deaths = Counter()  # death reason -> count
+
+    def merge(self, other):
+        self.games += other.games
+        self.days += other.days
+        self.unfinished += other.unfinished
+        self.wins.update(other.wins)
+        self.deaths.update(other.deaths)
+        return self
+
+    def win_rates(self):
+        if not self.games:
+            return {}
+        return {team: count / self.games for team, count in self.wins.most_common()}
+
+    def to_dict(self):
+        return {
+            "games": self.games,
+            "avg_days": round(self.days / self.games, 3) if self.games else 0,
+            "unfinished": self.unfinished,
+            "wins": dict(self.wins),
+            "win_rates": {k: round(v, 4) for k, v in self.win_rates().items()},
+            "deaths": dict(self.deaths),
+        }
+
+
+# --- Driver ---
+class Simulator:
+    """
+    Plays games for one role set and player count.
+    Ids, names, the policy and the stats are built once and reused for every game.
+    """
+
+    def __init__(self, role_keys, num_players, policy=None, settings=None, max_days=50):
+        self.role_keys = list(role_keys)
+        self.num_players = num_players
+        self.policy = policy or RandomPolicy()
+        self.settings = settings or {}
+        self.max_days = max_days
+        self.player_ids = [f"p{i}" for i in range(num_players)]
+        self.player_names = [f"P{i + 1}" for i in range(num_players)]
+        self.null_writer = NullWriter()
+
+    def run(self, seeds, stats=None):
+        """Plays one game per seed, silencing engine logs for the whole batch."""
+        stats = stats or SimulationStats()
+        with contextlib.redirect_stdout(self.null_writer):
+            for seed in seeds:
+                self.play_game(seed, stats)
+        return stats
+
+    def play_game(self, seed, stats):
+        self.policy.seed(seed)
+
+        game = Game(f"SIM{seed}", settings=self.settings, seed=seed)
+        for player_id, name in zip(self.player_ids, self.player_names):
+            game.add_player(player_id, name)
+        game.assign_roles(self.role_keys)
+        game.set_phase(PHASE_NIGHT)
+
+        day = 0
+        finished = False
+        while day < self.max_days:
+            day += 1
+            if self.play_night(game, stats) or self.play_day(game, stats):
+                finished = True
+                break
+
+        stats.games += 1
+        stats.days += day
+        if finished and game.winner:
+            stats.wins[self.winner_label(game)] += 1
+        else:
+            stats.unfinished += 1
+
+    def play_night(self, game, stats):
+        """Returns True if the game ended."""
+        policy = self.policy
+        game_context = game.build_context()
+        for player in game.get_living_players():
+            if player.role.is_night_active:
+                action = policy.night_action(game, player, game_context)
+                game.receive_night_action(player.id, action)
+
+        for event in game.resolve_night_deaths():
+            if event.get("type") == "death":
+                stats.deaths[reason_key(event["reason"])] += 1
+
+        if game.check_game_over():
+            return True
+        game.advance_phase()
+        return False
+
+    def play_day(self, game, stats):
+        """Accusations (one tie restart), then the lynch trial. Returns True if the game ended."""
+        policy = self.policy
+        while game.phase == PHASE_ACCUSATION:
+            for player in self.voters(game):
+                target_id = policy.accuse(game, player)
+                game.process_accusation(player.id, target_id)
+            outcome = game.tally_accusations()
+            if outcome["result"] == "restart":
+                game.set_phase(PHASE_ACCUSATION)
+
+        if game.phase != PHASE_LYNCH:
+            return False  # Nobody accused or deadlock, tally already set Night
+
+        target_id = game.lynch_target_id
+        for player in self.voters(game):
+            game.cast_lynch_vote(player.id, policy.lynch_vote(game, player, target_id))
+
+        result = game.resolve_lynch_vote()
+        if result["killed_id"]:
+            stats.deaths["Lynched"] += 1
+        for death in result["secondary_deaths"]:
+            stats.deaths[reason_key(death["reason"])] += 1
+
+        if result["game_over"] or game.check_game_over():
+            return True
+        game.advance_phase()
+        return False
+
+    def voters(self, game):
+        if game.is_ghost_mode_active():
+            return list(game.players.values())
+        return game.get_living_players()
+
+    def winner_label(self, game):
+        if game.winner in TEAM_WINNERS:
+            return game.winner
+        for player in game.players.values():
+            if player.name == game.winner:
+                return f"Solo:{player.role.name_key}"
+        return str(game.winner)
+
+
+def simulate(role_keys, num_players, games, seed=0, policy="random", settings=None, max_days=50):
+    """Convenience wrapper: plays seeds [seed, seed + games) and returns SimulationStats."""
+    simulator = Simulator(
+        role_keys, num_players, policy=POLICIES[policy](), settings=settings, max_days=max_days
+    )
+    return simulator.run(range(seed, seed + games))
+
+
+def _run_shard(job):
+    """Worker entry point. Returns only the shard's SimulationStats, never games."""
+    role_keys, num_players, seed_start, seed_stop, policy, settings, max_days = job
+    simulator = Simulator(
+        role_keys, num_players, policy=POLICIES[policy](), settings=settings, max_days=max_days
+    )
+    return simulator.run(range(seed_start, seed_stop))
+
+
+def simulate_parallel(
+    role_keys,
+    num_players,
+    games,
+    seed=0,
+    policy="random",
+    settings=None,
+    max_days=50,
+    workers=None,
+    shard_size=None,
+):
+    """
+    Same seeds and totals as simulate(), spread over a ProcessPoolExecutor.
+    Seeds are cut into contiguous shards (a few per worker to even out stragglers)
+    and the per-shard aggregates are merged here.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return simulate(role_keys, num_players, games, seed, policy, settings, max_days)
+
+    shard_size = shard_size or max(1, -(-games // (workers * 4)))
+    jobs = [
+        (role_keys, num_players, start, min(start + shard_size, seed + games), policy, settings, max_days)
+        for start in range(seed, seed + games, shard_size)
+    ]
+    stats = SimulationStats()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for shard_stats in pool.map(_run_shard, jobs):
+            stats.merge(shard_stats)
+    return stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Headless Werewolves balance simulator")
+    parser.add_argument(
+        "--players",
+        default="8",
+        help="Comma separated player counts, e.g. 6,8,12",
+    )
+    parser.add_argument(
+        "--roles",
+        action="append",
+        help="Comma separated role keys for one role set (repeat for more sets)",
+    )
+    parser.add_argument("--games", type=int, default=1000, help="Games per configuration")
+    parser.add_argument("--seed", type=int, default=0, help="First seed")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random")
+    parser.add_argument("--ghost-mode", action="store_true")
+    parser.add_argument("--max-days", type=int, default=50)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes (0 = one per CPU core)",
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    known_roles = role_key_map()
+    args.role_sets = []
+    for role_set in args.roles or [""]:
+        keys = [k.strip() for k in role_set.split(",") if k.strip()]
+        unknown = [k for k in keys if k not in known_roles]
+        if unknown:
+            parser.error(f"Unknown roles: {', '.join(unknown)}")
+        args.role_sets.append(keys)
+
+    args.player_counts = [int(n) for n in args.players.split(",") if n.strip()]
+    if any(n < GAME_DEFAULTS["MIN_PLAYERS"] for n in args.player_counts):
+        parser.error(f"Need at least {GAME_DEFAULTS['MIN_PLAYERS']} players")
+    return args
+
+
+def format_result(role_keys, num_players, stats, elapsed):
+    lines = [
+        f"=== Roles: {','.join(role_keys) or '(default)'} | Players: {num_players} "
+        f"| Games: {stats.games} | {stats.games / max(elapsed, 1e-9):.0f} games/s ==="
+    ]
+    for team, rate in stats.win_rates().items():
+        lines.append(f"  {team:<24} {rate:7.2%}")
+    if stats.unfinished:
+        lines.append(f"  {'(unfinished)':<24} {stats.unfinished / stats.games:7.2%}")
+    lines.append(f"  avg days: {stats.days / stats.games:.2f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    settings = {"ghost_mode": args.ghost_mode}
+    results = []
+    for role_keys in args.role_sets:
+        for num_players in args.player_counts:
+            start = time.perf_counter()
+            stats = simulate_parallel(
+                role_keys,
+                num_players,
+                args.games,
+                seed=args.seed,
+                policy=args.policy,
+                settings=settings,
+                max_days=args.max_days,
+                workers=args.workers,
+            )
+            elapsed = time.perf_counter() - start
+            if args.json:
+                results.append(
+                    {"roles": role_keys, "players": num_players, **stats.to_dict()}
+                )
+            else:
+                print(format_result(role_keys, num_players, stats, elapsed))
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+snapshots.py
+Version: 1.0.0
+Crash recovery for rooms. Each room is written as one compact JSON file at
+phase boundaries (write to a temp file, then os.replace, so a crash mid-write
+never leaves a torn snapshot). After a restart, rooms are read back lazily the
+first time their code is looked up.
+"""
+import json
+import os
+import time
+
+SNAPSHOT_FORMAT = 1
+
+
+class SnapshotStore:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, code):
+        return os.path.join(self.directory, f"{code}.json")
+
+    def save(self, code, data):
+        """Atomically replaces the snapshot for code. Returns False on I/O errors."""
+        payload = {"format": SNAPSHOT_FORMAT, "saved_at": time.time(), "room": data}
+        tmp_path = f"{self.path(code)}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, separators=(",", ":"))
+            os.replace(tmp_path, self.path(code))
+            return True
+        except (OSError, TypeError, ValueError) as e:
+            print(f"WARNING: Snapshot of room {code} failed: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
+
+    def load(self, code):
+        """Returns the room data saved for code, or None."""
+        if not code.isalnum():  # lookups may carry client input, keep them inside directory
+            return None
+        try:
+            with open(self.path(code), encoding="utf-8") as f:
+                payload = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"WARNING: Snapshot of room {code} unreadable: {e}")
+            return None
+        if payload.get("format") != SNAPSHOT_FORMAT:
+            return None
+        return payload["room"]
+
+    def delete(self, code):
+        try:
+            os.remove(self.path(code))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"WARNING: Snapshot of room {code} not deleted: {e}")
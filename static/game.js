@@ -6,6 +6,12 @@ const PHASE_LYNCH = "Lynch_Vote";
 const PHASE_GAME_OVER = "Game_Over";
 
 const socket = io();
+// Server coalesces the emits of one action into a single "batch" frame per client
+socket.on("batch", (data) => {
+  (data.events || []).forEach(([event, payload]) => {
+    socket.listeners(event).forEach((listener) => listener(payload));
+  });
+});
 
 let translations = {};
 let currentLang = window.userLang || "en";
@@ -132,7 +138,8 @@ function updateStaticUIText() {
 let ROLE_DATA = {};
 let myRole;
 let publicHistory = [],
-  isAlive = false;
+  isAlive = false,
+  inWerewolfChat = false;
 let livingPlayers = [],
   allPlayers = [],
   isAdmin = false;
@@ -154,6 +161,14 @@ let hasActed = new Set(),
 let totalAccusationDuration = 90,
   sleepButtonTimeout = null;
 
+// Delta Sync State (last full state rebuilt from game_state_delta patches)
+let syncState = null,
+  syncVersion = 0;
+// Message History Sync (server keeps a ring buffer, we fetch entries after historySeq)
+let historySeq = 0,
+  historyRequested = false,
+  historyRequestSeq = 0;
+
 fetch("/get_roles")
   .then((response) => response.json())
   .then((roles) => {
@@ -200,7 +215,7 @@ const els = {
 };
 
 // --- Helper Functions ---
-function logMessage(message, isPrivate = false) {
+function logMessage(message, isPrivate = false, older = false) {
   let text = t(message);
 
   let div = document.createElement("div");
@@ -208,7 +223,9 @@ function logMessage(message, isPrivate = false) {
   if (isPrivate) {
     div.classList.add("private-msg");
   }
-  els.log.prepend(div);
+  // Newest on top, "older" lines go below everything already logged
+  if (older) els.log.append(div);
+  else els.log.prepend(div);
 }
 
 function resetLog(history) {
@@ -254,7 +271,14 @@ function setChatMode(isAdminOnly, phase) {
   let placeholder =
     t({ key: "ui.game.chat_restricted_placeholder" }) || "Chat is restricted.";
 
-  if (phase === PHASE_NIGHT && !isAdmin) {
+  if (phase === PHASE_NIGHT && inWerewolfChat && !isAdminOnly) {
+    // Living wolves get their own night channel
+    els.gameChatTitle.textContent =
+      t({ key: "ui.game.werewolf_chat_title" }) || "Werewolf Chat 🐺";
+    placeholder =
+      t({ key: "ui.game.chat_werewolf_placeholder" }) || "Plot with your pack...";
+    isChatDisabled = false;
+  } else if (phase === PHASE_NIGHT && !isAdmin) {
     placeholder =
       t({ key: "ui.game.chat_night_placeholder" }) || "sleepy quiet time...zzz";
     isChatDisabled = true;
@@ -494,7 +518,7 @@ socket.on("pnp_state_sync", (data) => {
   els.gameContainer.style.display = "flex";
   const mainPanel = document.querySelector(".main-panel");
   if (els.log && mainPanel) {
-    resetLog(data.message_history);
+    resetLog(publicHistory);
     mainPanel.appendChild(els.log);
   }
   // 3. Inject PnP specific "Back" button
@@ -509,6 +533,7 @@ socket.on("pnp_state_sync", (data) => {
   myNightMetadata = data.my_phase_metadata || {};
   myRole = data.your_role;
   isAlive = data.is_alive;
+  inWerewolfChat = !!data.werewolf_chat;
   isAdmin = data.is_admin;
 
   myLynchVote = data.my_lynch_vote;
@@ -1145,6 +1170,28 @@ socket.on("force_phase_update", () => {
 });
 
 socket.on("game_state_sync", (data) => {
+  syncState = data;
+  syncVersion = data.state_version || 0;
+  if (data.state_version) socket.emit("state_ack", { version: syncVersion });
+  applyGameState(data);
+});
+
+socket.on("game_state_delta", (delta) => {
+  // Version gap (missed packet, reload): ask the server for a full state
+  if (!syncState || delta.base_version !== syncVersion) {
+    syncState = null;
+    socket.emit("client_ready_for_game");
+    return;
+  }
+  const next = Object.assign({}, syncState, delta.changed);
+  (delta.removed || []).forEach((key) => delete next[key]);
+  syncState = next;
+  syncVersion = delta.state_version;
+  socket.emit("state_ack", { version: syncVersion });
+  applyGameState(next);
+});
+
+function applyGameState(data) {
   // 1. Detect Phase Change to Clear PnP History
   isPnP = data.mode === "pass_and_play";
 
@@ -1174,6 +1221,7 @@ socket.on("game_state_sync", (data) => {
   myRole = data.your_role;
   isAdmin = data.is_admin;
   isAlive = data.is_alive;
+  inWerewolfChat = !!data.werewolf_chat;
   livingPlayers = data.living_players;
   allPlayers = data.all_players;
   timersDisabled = data.timers_disabled;
@@ -1187,12 +1235,10 @@ socket.on("game_state_sync", (data) => {
   if (data.total_accusation_duration)
     totalAccusationDuration = data.total_accusation_duration;
 
-  if (data.message_history) publicHistory = data.message_history;
-
-  if (data.message_history && els.log.innerHTML.trim() === "") {
-    data.message_history.forEach((msg) => logMessage(msg, false));
-    // Scroll to bottom
-    els.log.scrollTop = els.log.scrollHeight;
+  if (data.history_seq !== historySeq && !historyRequested) {
+    historyRequested = true;
+    historyRequestSeq = historySeq;
+    socket.emit("history_since", { seq: historySeq });
   }
 
   if (myPhaseTargetId === null) lastSeerResult = null;
@@ -1264,6 +1310,24 @@ socket.on("game_state_sync", (data) => {
   updatePlayerListView(data.accusation_counts || {});
   updateAdminControls();
   startTimer(data.phase_end_time);
+}
+
+socket.on("history_entries", (data) => {
+  historyRequested = false;
+  if (data.reset) publicHistory = [];
+
+  // Live events already logged everything after the first load. The first
+  // load may still arrive after some live lines, the backlog goes below them.
+  const firstLoad = historyRequestSeq === 0 || data.reset;
+  data.entries.forEach((entry) => publicHistory.push(entry.message));
+  if (firstLoad) {
+    data.entries
+      .slice()
+      .reverse()
+      .forEach((entry) => logMessage(entry.message, false, true));
+    els.log.scrollTop = els.log.scrollHeight;
+  }
+  historySeq = data.last_seq;
 });
 
 socket.on("phase_change", (data) => {
@@ -1308,6 +1372,9 @@ socket.on("new_message", (data) => {
   } else if (!isAlive && data.channel === "ghost" && target) {
     div.classList.add("ghost-chat");
     target.prepend(div);
+  } else if (data.channel === "werewolves" && target) {
+    div.classList.add("werewolf-chat");
+    target.prepend(div);
   }
 });
 
@@ -1347,8 +1414,6 @@ socket.on("pnp_player_done", (data) => {
 socket.on("night_result_kill", (data) => {
   if (data.message) {
     logMessage(data.message, false);
-    console.log("publicHistory add: ${data.message}");
-    publicHistory.push(data.message);
   }
   // Update local state if I am the one who died
   if (data.killed_player && myPlayerId === data.killed_player.id) {
@@ -1399,7 +1464,6 @@ socket.on("werewolf_team_info", (data) => {
 socket.on("lynch_vote_result", (data) => {
   let msg = t(data.message);
 
-  publicHistory.push(msg);
   logMessage(msg, false);
   if (data.killed_id === myPlayerId) isAlive = false;
 });
@@ -1409,7 +1473,6 @@ socket.on("accusation_made", (data) => {
     key: "events.accusation_made",
     variables: { accuser: data.accuser_name, target: data.accused_name },
   });
-  publicHistory.push(msg);
   logMessage(msg, false);
 
   if (myPlayerId === data.accuser_id) {
@@ -1443,7 +1506,6 @@ socket.on("lynch_vote_started", (data) => {
     key: "events.trial_started",
     variables: { target: data.target_name },
   });
-  publicHistory.push(msg);
   logMessage(msg, false);
 
   currentLynchTargetName = data.target_name;
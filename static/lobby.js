@@ -109,6 +109,12 @@ const SPECIAL_WEREWOLVES = [
 ];
 
 const socket = io();
+// Server coalesces the emits of one action into a single "batch" frame per client
+socket.on("batch", (data) => {
+  (data.events || []).forEach(([event, payload]) => {
+    socket.listeners(event).forEach((listener) => listener(payload));
+  });
+});
 // Ensure backend renders 'player_id' into the template
 let isPlayerAdmin = false;
 
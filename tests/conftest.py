@@ -0,0 +1,55 @@
+"""
+conftest.py
+Version: 1.0.0
+Shared fixtures. app.py is imported once, as a single worker with snapshots,
+journals and the message queue off, whatever .env.werewolves says.
+"""
+import contextlib
+import io
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+for name in ("SNAPSHOT_DIR", "JOURNAL_DIR", "SOCKETIO_MESSAGE_QUEUE"):
+    os.environ[name] = ""
+os.environ["SOCKETIO_SERIALIZER"] = "default"
+
+
+@pytest.fixture(scope="session")
+def server():
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+    from config import GAME_DEFAULTS
+
+    GAME_DEFAULTS["PAUSE_DURATION"] = 0  # run continuations inline
+    return app
+
+
+@pytest.fixture
+def login(server):
+    """login(name, code) -> Socket.IO test client of a player logged into table code."""
+
+    def login(name, code):
+        http = server.app.test_client()
+        response = http.post("/", data={"name": name, "game_code": code, "language": "en"})
+        assert response.status_code == 302
+        server.rate_limiter.reset()
+        return server.socketio.test_client(server.app, flask_test_client=http)
+
+    return login
+
+
+def received(client):
+    """[(event, data)] the client got since the last call, batches unpacked."""
+    events = []
+    for packet in client.get_received():
+        args = packet["args"]
+        if packet["name"] == "batch":
+            events.extend((event, data) for event, data in args[0]["events"])
+        else:
+            events.append((packet["name"], args[0] if args else None))
+    return events
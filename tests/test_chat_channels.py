@@ -0,0 +1,80 @@
+"""
+test_chat_channels.py
+Version: 1.0.0
+Wolf and ghost chat reach their own channel and nobody else, not even a
+socket that asks to join the channel's Socket.IO room by name, and a table
+that changes code leaves nobody behind in the old code's rooms.
+"""
+from conftest import received
+
+from game_engine import PHASE_ACCUSATION, PHASE_NIGHT
+from rooms import CHAT_CHANNELS
+
+
+def start_table(server, login, code, count=6):
+    """Starts a standard game, returns (room, {player_id: client})."""
+    clients = [login(f"{code}p{i}", code) for i in range(count)]
+    clients[0].emit(
+        "start_game",
+        {"settings": {"mode": "standard"}, "roles": ["Villager", "Werewolf", "Seer"]},
+    )
+    room = server.rooms.get(code)
+    client_by_name = {f"{code}p{i}": client for i, client in enumerate(clients)}
+    return room, {
+        pid: client_by_name[wrapper.name] for pid, wrapper in room.game["players"].items()
+    }
+
+
+def chat(client):
+    return [data for event, data in received(client) if event == "new_message"]
+
+
+def test_wolf_chat_reaches_only_living_wolves(server, login):
+    room, clients = start_table(server, login, "WOLFA")
+    game = room.game_instance
+    assert game.phase == PHASE_NIGHT
+    wolves = set(game.living_by_team["Werewolves"])
+    intruder = login("Intruder", "WOLFB")
+    intruder.emit("join_game", {"room": room.channel("werewolves")})
+    for client in [*clients.values(), intruder]:
+        received(client)
+
+    clients[next(iter(wolves))].emit("send_message", {"message": "the seer"})
+
+    for pid, client in clients.items():
+        wolf_lines = [m for m in chat(client) if m["channel"] == "werewolves"]
+        assert len(wolf_lines) == (1 if pid in wolves else 0)
+    assert chat(intruder) == []
+
+
+def test_ghost_chat_reaches_only_the_dead(server, login):
+    room, clients = start_table(server, login, "GHOSTA")
+    game = room.game_instance
+    with room.lock:
+        victim = next(p for p in game.living.values() if p.role.team != "Werewolves")
+        game.kill_player(victim)
+        game.phase = PHASE_ACCUSATION
+    intruder = login("Intruder", "GHOSTB")
+    intruder.emit("join_game", {"room": room.channel("ghost")})
+    for client in [*clients.values(), intruder]:
+        received(client)
+
+    clients[victim.id].emit("send_message", {"message": "it was the baker"})
+
+    for pid, client in clients.items():
+        ghost_lines = [m for m in chat(client) if m["channel"] == "ghost"]
+        assert len(ghost_lines) == (1 if pid == victim.id else 0)
+    assert chat(intruder) == []
+
+
+def test_new_code_empties_the_old_channels(server, login):
+    room, clients = start_table(server, login, "RENAMEA")
+    admin = clients[room.admin_id()]
+    old_rooms = [room.code, *(room.channel(name) for name in CHAT_CHANNELS)]
+
+    admin.emit("admin_set_new_code", {"new_code": "RENAMEB"})
+
+    assert room.code == "RENAMEB"
+    manager = server.socketio.server.manager
+    for name in old_rooms:
+        assert list(manager.get_participants("/", name)) == []
@@ -0,0 +1,66 @@
+"""
+test_journal.py
+Version: 1.0.0
+Replaying a journal rebuilds the game it recorded, draw for draw.
+"""
+import contextlib
+import io
+
+from game_engine import PHASE_NIGHT, Game
+from journal import OP_RNG, OP_START, Journal, read_journal
+from replay import replay
+from simulator import RandomPolicy, SimulationStats, Simulator
+
+ROLES = ["Werewolf", "Werewolf", "Seer", "Witch", "Cupid", "Hunter", "Honeypot", "Villager"]
+# Wall clock times differ between the live game and the replay
+CLOCK_KEYS = ("phase_start_time", "phase_end_time", "journal_path")
+
+
+def play_journaled_game(path, seed):
+    simulator = Simulator(ROLES, len(ROLES), policy=RandomPolicy())
+    simulator.policy.seed(seed)
+    stats = SimulationStats()
+    # Ghost mode, so dead players' votes add random draws to replay
+    game = Game("JRN", settings={"ghost_mode": True}, seed=seed)
+    for i in range(len(ROLES)):
+        game.add_player(f"p{i}", f"P{i}")
+    game.assign_roles(ROLES)
+    game.start_journal(Journal(path))
+    game.set_phase(PHASE_NIGHT)
+    for _ in range(20):
+        if simulator.play_night(game, stats) or simulator.play_day(game, stats):
+            break
+    game.close_journal()
+    return game
+
+
+def comparable(game):
+    snapshot = game.to_snapshot()
+    for key in CLOCK_KEYS:
+        snapshot.pop(key)
+    return snapshot
+
+
+def test_replay_rebuilds_the_recorded_game(tmp_path):
+    for seed in (1, 3, 4):
+        path = str(tmp_path / f"game{seed}.wwj")
+        with contextlib.redirect_stdout(io.StringIO()):
+            live = play_journaled_game(path, seed)
+            records = read_journal(path)
+            replayed = replay(records)
+
+        assert records[0][0] == OP_START
+        assert any(opcode == OP_RNG for opcode, _ in records)
+        assert live.winner is not None
+        assert comparable(replayed) == comparable(live)
+
+
+def test_torn_last_record_is_dropped(tmp_path):
+    path = str(tmp_path / "torn.wwj")
+    with contextlib.redirect_stdout(io.StringIO()):
+        play_journaled_game(path, 1)
+    records = read_journal(path)
+    with open(path, "rb+") as f:
+        f.truncate(f.seek(0, 2) - 1)
+
+    assert read_journal(path) == records[:-1]
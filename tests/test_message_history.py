@@ -0,0 +1,41 @@
+"""
+test_message_history.py
+Version: 1.0.0
+The public message ring buffer: sequence numbers, since() and wraparound.
+"""
+from game_engine import MessageHistory
+
+
+def test_since_returns_only_newer_entries():
+    history = MessageHistory(capacity=10)
+    for text in ("a", "b", "c"):
+        history.append(text)
+
+    assert history.since(0) == [
+        {"seq": 1, "message": "a"},
+        {"seq": 2, "message": "b"},
+        {"seq": 3, "message": "c"},
+    ]
+    assert history.since(2) == [{"seq": 3, "message": "c"}]
+    assert history.since(3) == []
+    assert history.since(7) == []
+
+
+def test_wraparound_keeps_the_newest_entries_and_their_seqs():
+    history = MessageHistory(capacity=3)
+    for i in range(1, 6):
+        history.append(f"m{i}")
+
+    assert len(history) == 3
+    assert history.last_seq == 5
+    assert list(history) == ["m3", "m4", "m5"]
+    # Entries before the buffer's start are gone, the rest keep their seq
+    assert [entry["seq"] for entry in history.since(0)] == [3, 4, 5]
+    assert [entry["seq"] for entry in history.since(1)] == [3, 4, 5]
+    assert [entry["seq"] for entry in history.since(3)] == [4, 5]
+
+
+def test_empty_history():
+    history = MessageHistory(capacity=3)
+    assert history.since(0) == []
+    assert history.last_seq == 0
@@ -0,0 +1,54 @@
+"""
+test_ratelimit.py
+Version: 1.0.0
+Token buckets, and the login limit keyed on the connection's address.
+"""
+from ratelimit import TokenBuckets
+
+
+def test_burst_then_refill():
+    buckets = TokenBuckets(rate=1, burst=2, max_keys=10)
+    assert buckets.allow("ip", now=0)
+    assert buckets.allow("ip", now=0)
+    assert not buckets.allow("ip", now=0)
+    assert buckets.allow("ip", now=1)
+
+
+def test_refilled_buckets_are_evicted():
+    buckets = TokenBuckets(rate=1, burst=2, max_keys=10)
+    buckets.allow("old", now=0)
+    buckets.allow("recent", now=1.5)
+    assert len(buckets) == 2
+
+    # "old" has refilled completely by t=2 (burst / rate), "recent" has not
+    buckets.allow("new", now=2.5)
+    assert set(buckets.buckets) == {"recent", "new"}
+
+
+def test_max_keys_drops_the_least_recently_seen():
+    buckets = TokenBuckets(rate=0.001, burst=1, max_keys=2)
+    buckets.allow("a", now=0)
+    buckets.allow("b", now=0)
+    buckets.allow("a", now=0)  # refused, but "a" is now the most recent
+    buckets.allow("c", now=0)
+
+    assert set(buckets.buckets) == {"a", "c"}
+    # "b" was dropped, so it starts over with a full bucket
+    assert buckets.allow("b", now=0)
+    assert len(buckets) == 2
+
+
+def test_forwarded_for_does_not_reset_the_login_limit(server):
+    server.rate_limiter.reset()
+    http = server.app.test_client()
+    burst = int(server.GAME_DEFAULTS["RATE_LIMITS"]["join"]["burst"])
+    pages = []
+    for i in range(burst + 1):
+        response = http.post(
+            "/",
+            data={"name": f"Spoof{i}", "game_code": "SPOOF", "language": "en"},
+            headers={"X-Forwarded-For": f"10.0.0.{i}"},
+        )
+        pages.append(response.get_data(as_text=True))
+    server.rate_limiter.reset()
+    assert "Too many attempts" in pages[-1]
@@ -0,0 +1,62 @@
+"""
+vendor_js.py
+Version: 1.0.0
+Copies pinned browser bundles from node_modules into static/, with the
+package's version and license in a header (bundles that carry their own keep
+it). Versions are pinned in package.json. The Docker image builds them itself.
+
+Usage:
+    npm install
+    python vendor_js.py
+"""
+import json
+import os
+import sys
+from os.path import dirname, join
+
+ROOT = dirname(os.path.abspath(__file__))
+
+# npm package -> (bundle inside the package, file in static/)
+# socket.io-client matches static/socket.io.min.js, its msgpack build has the parser built in
+BUNDLES = {
+    "socket.io-client": (
+        "dist/socket.io.msgpack.min.js",
+        "socket.io.msgpack.min.js",
+    ),
+}
+
+
+def vendor(package, bundle, target):
+    package_dir = join(ROOT, "node_modules", package)
+    with open(join(package_dir, "package.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    with open(join(package_dir, bundle), encoding="utf-8") as f:
+        code = f.read()
+    header = ""
+    if not code.startswith("/*!"):
+        header = (
+            "/*!\n"
+            f" * {package} v{meta['version']}\n"
+            f" * {meta.get('homepage') or meta.get('repository', {}).get('url', '')}\n"
+            f" * Released under the {meta.get('license', 'see package')} License.\n"
+            " */\n"
+        )
+    with open(join(ROOT, "static", target), "w", encoding="utf-8") as f:
+        f.write(header + code)
+    print(f"static/{target}: {package} v{meta['version']} ({meta.get('license')})")
+
+
+def main():
+    missing = []
+    for package, (bundle, target) in BUNDLES.items():
+        try:
+            vendor(package, bundle, target)
+        except FileNotFoundError as e:
+            missing.append(f"{package}: {e}")
+    if missing:
+        print("Run npm install first.\n" + "\n".join(missing))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()